@@ -0,0 +1,139 @@
+"""
+Compares the synchronous (WSGI) and async (ASGI) users API.
+
+The synchronous views are driven by Django's test ``Client`` from a pool of
+threads, one per concurrent request, which is how a threaded WSGI server
+serves them. The async views are driven by ``AsyncClient`` from a single
+event loop with the same concurrency. Both run against a seeded throwaway
+database; throughput and latency percentiles are printed per endpoint.
+
+    python -m benchmarks.asgi_vs_wsgi --users 2000 --requests 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from .common import report, seed_users, setup_django
+
+
+def scenarios(emails, tokens):
+    """Yields ``(name, sync_path, async_path, method, payload_factory)``"""
+
+    yield (
+        "retrieve-user",
+        "/users/user/%s/",
+        "/users/async/user/%s/",
+        "get",
+        lambda: random.choice(emails),
+    )
+    yield (
+        "verify-token",
+        "/users/verify-token/",
+        "/users/async/verify-token/",
+        "post",
+        lambda: {"token": random.choice(tokens)},
+    )
+
+
+def run_sync(path, method, make_args, requests, concurrency):
+    from django.db import connections
+    from django.test import Client
+
+    def call(_):
+        client = Client()
+        argument = make_args()
+        started = perf_counter()
+
+        if method == "get":
+            response = client.get(path % argument)
+        else:
+            response = client.post(path, argument, content_type="application/json")
+
+        assert response.status_code == 200, response.content
+        return perf_counter() - started
+
+    def closing(index):
+        try:
+            return call(index)
+        finally:
+            connections.close_all()
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(closing, range(requests)))
+
+    return perf_counter() - started, latencies
+
+
+def run_async(path, method, make_args, requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def call():
+            async with slots:
+                argument = make_args()
+                started = perf_counter()
+
+                if method == "get":
+                    response = await client.get(path % argument)
+                else:
+                    response = await client.post(
+                        path, argument, content_type="application/json"
+                    )
+
+                assert response.status_code == 200, response.content
+                return perf_counter() - started
+
+        started = perf_counter()
+        latencies = await asyncio.gather(*(call() for _ in range(requests)))
+        return perf_counter() - started, latencies
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    options = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.authtoken.models import Token
+
+    from users import authentication, profiles
+
+    emails = seed_users(options.users)
+    tokens = list(Token.objects.values_list("key", flat=True))
+    rows = []
+
+    for name, sync_path, async_path, method, make_args in scenarios(emails, tokens):
+        for label, runner, path in (
+            ("%s (WSGI, threads)" % name, run_sync, sync_path),
+            ("%s (ASGI, async)" % name, run_async, async_path),
+        ):
+            # Every run starts cold so neither side profits from the other
+            profiles.cache.clear()
+            authentication._local_tokens.clear()
+
+            seconds, latencies = runner(
+                path, method, make_args, options.requests, options.concurrency
+            )
+            rows.append((label, options.requests, seconds, latencies))
+
+    report(
+        "%d requests, concurrency %d, %d users"
+        % (options.requests, options.concurrency, options.users),
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
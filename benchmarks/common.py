@@ -0,0 +1,124 @@
+"""Helpers shared by the benchmark scripts"""
+
+import os
+import sys
+import tempfile
+from statistics import quantiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(test_database=True, database_file=None):
+    """
+    Configures Django for a benchmark run.
+
+    Emails go to the in-memory backend and, unless ``test_database`` is
+    false, a throwaway test database is created so benchmarks never touch
+    real data; it lives in memory unless ``database_file`` names a file.
+    The shared cache goes to a throwaway directory too.
+    Returns the connection of the default database.
+    """
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "user_profile.settings")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("EMAIL_HOST_USER", "benchmark@example.com")
+    os.environ.setdefault("EMAIL_HOST_PASSWORD", "benchmark")
+    os.environ.setdefault(
+        "EMAIL_BACKEND", "django.core.mail.backends.locmem.EmailBackend"
+    )
+    if test_database:
+        os.environ.setdefault(
+            "SHARED_CACHE_LOCATION", tempfile.mkdtemp(prefix="shared-cache-")
+        )
+
+    import django
+
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ["*"]
+
+    if test_database:
+        if database_file:
+            connection.settings_dict["TEST"]["NAME"] = database_file
+        connection.creation.create_test_db(verbosity=0)
+
+    return connection
+
+
+def seed_users(count, verified=True, with_tokens=True):
+    """
+    Inserts ``count`` users with bulk inserts and returns their emails.
+
+    Every user shares one pre-hashed password, "benchmark-password", so
+    seeding costs a single hash. Users are added to the search index.
+    """
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+
+    from users import search
+
+    User = get_user_model()
+    password = make_password("benchmark-password")
+    users = User.objects.bulk_create(
+        [
+            User(
+                email="user%d@example.com" % index,
+                first_name="First%d" % index,
+                last_name="Last%d" % index,
+                password=password,
+                is_active=verified,
+                is_verified=verified,
+            )
+            for index in range(count)
+        ],
+        batch_size=1000,
+    )
+
+    search.get_backend().index(users)
+
+    if with_tokens:
+        Token.objects.bulk_create(
+            [Token(key=Token.generate_key(), user=user) for user in users],
+            batch_size=1000,
+        )
+
+    return [user.email for user in users]
+
+
+def percentiles(samples):
+    """Returns p50, p95 and p99 of ``samples``, in milliseconds"""
+
+    if len(samples) < 2:
+        value = samples[0] * 1000 if samples else 0.0
+        return {"p50": value, "p95": value, "p99": value}
+
+    cuts = quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49] * 1000, "p95": cuts[94] * 1000, "p99": cuts[98] * 1000}
+
+
+def report(title, rows):
+    """Prints ``rows`` of ``(label, requests, seconds, latencies)`` as a table"""
+
+    print(title)
+    print("%-28s %10s %10s %10s %10s" % ("", "req/s", "p50 ms", "p95 ms", "p99 ms"))
+
+    for label, requests, seconds, latencies in rows:
+        cuts = percentiles(latencies)
+        print(
+            "%-28s %10.0f %10.2f %10.2f %10.2f"
+            % (
+                label,
+                requests / seconds if seconds else 0.0,
+                cuts["p50"],
+                cuts["p95"],
+                cuts["p99"],
+            )
+        )
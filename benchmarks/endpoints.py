@@ -0,0 +1,547 @@
+"""
+Load benchmark of every route in ``users/urls.py``.
+
+Users are seeded into a throwaway database, then every endpoint is driven
+by concurrent in-process clients. For each one the throughput, p50/p95/p99
+latency, SQL queries per request, memory allocated per request and errors
+are reported. Query counts and memory are measured on separate sequential
+requests, so neither instrumentation skews the timings.
+
+Results can be stored as a baseline and later runs compared against it;
+the run fails when an endpoint regresses by more than ``--threshold``:
+
+    python -m benchmarks.endpoints --save-baseline
+    python -m benchmarks.endpoints --compare
+
+Baselines only compare on the same machine and with the same options, the
+options are stored alongside the results and checked.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from time import perf_counter
+
+from .common import percentiles, seed_users, setup_django
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+PASSWORD = "benchmark-password"
+
+
+class Endpoint:
+    """A route to benchmark and how to build one request to it"""
+
+    def __init__(self, name, method, path, data=None, admin=False, status=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.admin = admin
+        self.status = status
+
+    def call(self, client):
+        path = self.path() if callable(self.path) else self.path
+        data = self.data() if callable(self.data) else self.data
+        response = getattr(client, self.method)(path, data, format="json")
+
+        # Streaming responses do their work while being consumed
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+        return response.status_code == self.status
+
+
+def endpoints(emails, tokens):
+    """Builds the benchmarked endpoints, keyed by URL name"""
+
+    from django.contrib.auth import get_user_model
+
+    from users import jwt_tokens, links
+
+    serial = itertools.count()
+    # Users whose password or details change are kept away from the ones
+    # used to log in
+    mutable = emails[len(emails) // 2 :]
+
+    def new_user():
+        return {
+            "email": "new%d@example.com" % next(serial),
+            "first_name": "New",
+            "last_name": "User",
+            "password": PASSWORD,
+            "confirm_password": PASSWORD,
+        }
+
+    def stable_email():
+        return random.choice(emails[: len(emails) // 2])
+
+    def update_user():
+        email = random.choice(mutable)
+        return "/users/user/update/%s/" % email
+
+    # Signed tokens are made in memory, no query is added; refresh tokens
+    # are single use, every request gets a fresh pair
+    signed_users = list(get_user_model().objects.filter(email__in=emails[:100]))
+
+    def jwt_pair():
+        return jwt_tokens.issue(random.choice(signed_users))
+
+    def link_path(prefix, generator):
+        return lambda: "/users/%s/%s/" % (
+            prefix,
+            generator.make_link_token(random.choice(signed_users)),
+        )
+
+    found = [
+        Endpoint("main", "get", "/users/"),
+        Endpoint("all-users", "get", "/users/all/"),
+        Endpoint(
+            "search-users",
+            "get",
+            lambda: "/users/search/?q=first%d" % random.randint(1, 99),
+            admin=True,
+        ),
+        Endpoint("export-users", "get", "/users/export/", admin=True),
+        Endpoint("registration", "post", "/users/register/", new_user, status=201),
+        Endpoint(
+            "bulk-registration",
+            "post",
+            "/users/register/bulk/",
+            lambda: {"users": [new_user() for _ in range(10)]},
+            admin=True,
+            status=201,
+        ),
+        Endpoint(
+            "retrieve-user",
+            "get",
+            lambda: "/users/user/%s/" % stable_email(),
+        ),
+        Endpoint(
+            "lookup-users",
+            "post",
+            "/users/lookup/",
+            lambda: {"emails": random.sample(emails, 50)},
+        ),
+        Endpoint(
+            "update-user",
+            "patch",
+            update_user,
+            lambda: {"first_name": "Renamed%d" % next(serial)},
+            admin=True,
+        ),
+        Endpoint(
+            "token",
+            "post",
+            "/users/token/",
+            lambda: {"email": stable_email(), "password": PASSWORD},
+        ),
+        Endpoint(
+            "verify-token",
+            "post",
+            "/users/verify-token/",
+            lambda: {"token": random.choice(tokens)},
+        ),
+        Endpoint(
+            "verify-token-jwt",
+            "post",
+            "/users/verify-token/",
+            lambda: {"token": str(jwt_pair().access_token)},
+        ),
+        Endpoint(
+            "jwt",
+            "post",
+            "/users/jwt/",
+            lambda: {"email": stable_email(), "password": PASSWORD},
+        ),
+        Endpoint(
+            "jwt-refresh",
+            "post",
+            "/users/jwt/refresh/",
+            lambda: {"refresh": str(jwt_pair())},
+        ),
+        Endpoint(
+            "jwt-revoke",
+            "post",
+            "/users/jwt/revoke/",
+            lambda: {"refresh": str(jwt_pair())},
+        ),
+        Endpoint(
+            "verify-token-batch",
+            "post",
+            "/users/verify-token/batch/",
+            lambda: {"tokens": random.sample(tokens, 20)},
+        ),
+        Endpoint(
+            "verify-email",
+            "get",
+            link_path("verify-email", links.email_verification),
+        ),
+        Endpoint(
+            "send-verification-email",
+            "post",
+            "/users/send-verification-email/",
+            lambda: {"email": stable_email()},
+        ),
+        Endpoint(
+            "send-password-reset-link",
+            "post",
+            "/users/send-password-reset-link/",
+            lambda: {"email": stable_email()},
+        ),
+        Endpoint(
+            "reset-password",
+            "get",
+            link_path("reset-password", links.password_reset),
+        ),
+    ]
+
+    by_name = {endpoint.name: endpoint for endpoint in found}
+
+    # The async views answer the same requests under /users/async/
+    for name in ASYNC_ROUTES:
+        found.append(asynchronous(by_name[name]))
+
+    return {endpoint.name: endpoint for endpoint in found}
+
+
+ASYNC_ROUTES = (
+    "registration",
+    "retrieve-user",
+    "token",
+    "verify-token",
+    "verify-email",
+    "send-verification-email",
+    "send-password-reset-link",
+    "reset-password",
+)
+
+
+def asynchronous(endpoint):
+    """The scenario of ``endpoint`` against its async view"""
+
+    def path():
+        sync_path = endpoint.path() if callable(endpoint.path) else endpoint.path
+        return sync_path.replace("/users/", "/users/async/", 1)
+
+    return Endpoint(
+        "async:" + endpoint.name,
+        endpoint.method,
+        path,
+        endpoint.data,
+        admin=endpoint.admin,
+        status=endpoint.status,
+    )
+
+
+def route_names(patterns, namespace=""):
+    """Yields the names of ``patterns``, included ones with their namespace"""
+
+    from django.urls import URLResolver
+
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix += pattern.namespace + ":"
+
+            yield from route_names(pattern.url_patterns, prefix)
+        elif pattern.name:
+            yield namespace + pattern.name
+
+
+def check_coverage(benchmarked):
+    """Fails loudly when a route in ``users/urls.py`` has no benchmark"""
+
+    from users import urls
+
+    routes = set(route_names(urls.urlpatterns))
+    missing = sorted(routes - set(benchmarked))
+
+    if missing:
+        sys.exit("No benchmark for: %s" % ", ".join(missing))
+
+
+def make_client(token):
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION="Token %s" % token)
+    return client
+
+
+def measure(endpoint, clients, requests, concurrency):
+    """Times ``requests`` concurrent calls, returns seconds, latencies, errors"""
+
+    local = threading.local()
+    errors = []
+
+    def call(_):
+        if not hasattr(local, "client"):
+            local.client = clients()
+
+        started = perf_counter()
+        ok = endpoint.call(local.client)
+        elapsed = perf_counter() - started
+
+        if not ok:
+            errors.append(1)
+
+        return elapsed
+
+    started = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(call, range(requests)))
+
+    return perf_counter() - started, latencies, len(errors)
+
+
+def profile(endpoint, client, samples):
+    """Returns average queries and peak KiB allocated per request"""
+
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    queries = 0
+    peak = 0
+
+    for _ in range(samples):
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            endpoint.call(client)
+
+        queries += sum(len(context) for context in captured)
+
+    tracemalloc.start()
+    try:
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            endpoint.call(client)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return queries / samples, peak / 1024
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns a line per metric that regressed beyond ``threshold``, and per
+    endpoint missing from the baseline
+    """
+
+    regressions = []
+
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            regressions.append("%s: not in the baseline, regenerate it" % name)
+            continue
+
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(
+                "%s: %.0f req/s, baseline %.0f"
+                % (name, current["rps"], previous["rps"])
+            )
+
+        if current["p95"] > previous["p95"] * (1 + threshold):
+            regressions.append(
+                "%s: p95 %.2f ms, baseline %.2f"
+                % (name, current["p95"], previous["p95"])
+            )
+
+        if current["queries"] > previous["queries"] + 0.5:
+            regressions.append(
+                "%s: %.1f queries/request, baseline %.1f"
+                % (name, current["queries"], previous["queries"])
+            )
+
+        if current["memory_kib"] > previous["memory_kib"] * (1 + threshold) + 16:
+            regressions.append(
+                "%s: %.0f KiB/request, baseline %.0f"
+                % (name, current["memory_kib"], previous["memory_kib"])
+            )
+
+        if current["errors"] > previous["errors"]:
+            regressions.append(
+                "%s: %d errors, baseline %d"
+                % (name, current["errors"], previous["errors"])
+            )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=5,
+        help="Sequential requests measuring queries and memory (default: 5)",
+    )
+    parser.add_argument(
+        "--only", nargs="+", metavar="NAME", help="Benchmark these URL names only"
+    )
+    parser.add_argument(
+        "--real-hashing",
+        action="store_true",
+        help="Keep the production password hasher (default: a fast hasher, "
+        "so hashing does not drown out everything else)",
+    )
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Tolerated relative regression (default: 0.25)",
+    )
+    options = parser.parse_args()
+
+    # A file database with the production profile, so concurrent writers
+    # wait for each other instead of failing
+    os.environ.setdefault("DATABASE_PROFILE", "production")
+    if not options.real_hashing:
+        # Worker processes would keep hashing with the configured hasher
+        os.environ["PASSWORD_HASHING_WORKERS"] = "0"
+
+    directory = tempfile.TemporaryDirectory()
+    setup_django(database_file=os.path.join(directory.name, "benchmark.sqlite3"))
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model, hashers
+    from rest_framework.authtoken.models import Token
+
+    if not options.real_hashing:
+        settings.PASSWORD_HASHERS = [
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+            *settings.PASSWORD_HASHERS,
+        ]
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
+
+    emails = seed_users(options.users)
+    tokens = list(Token.objects.values_list("key", flat=True))
+
+    admin = get_user_model().objects.create_superuser(
+        "admin@example.com", "Admin", "User", PASSWORD
+    )
+    admin_token = Token.objects.create(user=admin).key
+
+    available = endpoints(emails, tokens)
+    check_coverage(available)
+
+    selected = options.only or list(available)
+    results = {}
+
+    print(
+        "%d users, %d requests per endpoint, concurrency %d%s"
+        % (
+            options.users,
+            options.requests,
+            options.concurrency,
+            "" if options.real_hashing else ", fast password hasher",
+        )
+    )
+    print(
+        "%-32s %9s %9s %9s %9s %9s %9s %7s"
+        % (
+            "endpoint",
+            "req/s",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "queries",
+            "KiB",
+            "errors",
+        )
+    )
+
+    for name in selected:
+        endpoint = available[name]
+        token = admin_token if endpoint.admin else random.choice(tokens)
+
+        seconds, latencies, errors = measure(
+            endpoint,
+            lambda: make_client(admin_token if endpoint.admin else token),
+            options.requests,
+            options.concurrency,
+        )
+        queries, memory = profile(endpoint, make_client(token), options.samples)
+        cuts = percentiles(latencies)
+
+        results[name] = {
+            "rps": options.requests / seconds,
+            "p50": cuts["p50"],
+            "p95": cuts["p95"],
+            "p99": cuts["p99"],
+            "queries": queries,
+            "memory_kib": memory,
+            "errors": errors,
+        }
+
+        print(
+            "%-32s %9.0f %9.2f %9.2f %9.2f %9.1f %9.0f %7d"
+            % (
+                name,
+                results[name]["rps"],
+                cuts["p50"],
+                cuts["p95"],
+                cuts["p99"],
+                queries,
+                memory,
+                errors,
+            )
+        )
+
+    meta = {
+        "users": options.users,
+        "requests": options.requests,
+        "concurrency": options.concurrency,
+        "real_hashing": options.real_hashing,
+    }
+
+    if options.save_baseline:
+        with open(options.baseline, "w") as handle:
+            json.dump({"meta": meta, "results": results}, handle, indent=2)
+            handle.write("\n")
+
+        print("Baseline saved to %s" % options.baseline)
+
+    if options.compare:
+        with open(options.baseline) as handle:
+            stored = json.load(handle)
+
+        if stored["meta"] != meta:
+            sys.exit("Baseline was recorded with other options: %s" % stored["meta"])
+
+        regressions = compare(results, stored["results"], options.threshold)
+
+        if regressions:
+            print("Failed the comparison at %.0f%%:" % (options.threshold * 100))
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+
+        print("No regressions beyond %.0f%%" % (options.threshold * 100))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares the read paths of the user serializers.
+
+``UserSerializer`` is fed model instances, the way the list view used to
+read users; ``UserValuesSerializer`` is fed ``values()`` rows. Each path is
+timed from the query to the JSON bytes, and checked to render the exact
+same document.
+
+    python -m benchmarks.serializers --users 10000 --rounds 5
+"""
+
+import argparse
+from time import perf_counter
+
+from .common import seed_users, setup_django
+
+
+def model_path():
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+
+    from users.serializers import UserSerializer
+
+    users = list(get_user_model().objects.order_by("id"))
+    return JSONRenderer().render(UserSerializer(users, many=True).data)
+
+
+def values_path():
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+
+    from users.serializers import UserValuesSerializer
+
+    rows = list(UserValuesSerializer.values(get_user_model().objects.order_by("id")))
+    return JSONRenderer().render(UserValuesSerializer(rows, many=True).data)
+
+
+def best_of(function, rounds):
+    timings = []
+
+    for _ in range(rounds):
+        started = perf_counter()
+        output = function()
+        timings.append(perf_counter() - started)
+
+    return min(timings), output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    options = parser.parse_args()
+
+    setup_django()
+    seed_users(options.users, with_tokens=False)
+
+    model_seconds, model_output = best_of(model_path, options.rounds)
+    values_seconds, values_output = best_of(values_path, options.rounds)
+
+    assert model_output == values_output, "The serializers render different JSON"
+
+    per_10k = 10000 / options.users * 1000
+    print("%d users, best of %d rounds" % (options.users, options.rounds))
+    print("%-28s %14s" % ("", "ms per 10k"))
+    print("%-28s %14.1f" % ("UserSerializer", model_seconds * per_10k))
+    print("%-28s %14.1f" % ("UserValuesSerializer", values_seconds * per_10k))
+    print("Speedup: %.1fx" % (model_seconds / values_seconds))
+
+
+if __name__ == "__main__":
+    main()
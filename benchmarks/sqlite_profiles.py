@@ -0,0 +1,185 @@
+"""
+Compares database profiles under concurrent reads and writes.
+
+Each profile runs in its own process against a fresh SQLite file. Reader
+threads fetch users by email while writer threads update ``last_login``
+in read-modify-write transactions, the pattern behind "database is locked"
+errors. Every operation is wrapped in the request started/finished signals,
+so connections are opened and closed exactly as they are when serving
+requests.
+
+    python -m benchmarks.sqlite_profiles --readers 8 --writers 4 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+from time import perf_counter
+
+from .common import percentiles, seed_users, setup_django
+
+PROFILES = ("default", "production")
+
+
+def run_profile(options):
+    setup_django(test_database=False)
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.core.signals import request_finished, request_started
+    from django.db import OperationalError, connection, connections, transaction
+    from django.utils import timezone
+
+    call_command("migrate", verbosity=0)
+    emails = seed_users(options.users, with_tokens=False)
+    connections.close_all()
+
+    User = get_user_model()
+    deadline = perf_counter() + options.seconds
+    lock = threading.Lock()
+    results = {
+        "reads": [],
+        "writes": [],
+        "errors": 0,
+        "connections": 0,
+    }
+
+    def count_connection(sender, connection, **kwargs):
+        with lock:
+            results["connections"] += 1
+
+    from django.db.backends.signals import connection_created
+
+    connection_created.connect(count_connection)
+
+    def read():
+        User.objects.get(email=random.choice(emails))
+
+    def write():
+        with transaction.atomic():
+            user = User.objects.get(email=random.choice(emails))
+            user.last_login = timezone.now()
+            user.save(update_fields=["last_login"])
+
+    def loop(operation, samples):
+        local = []
+        errors = 0
+
+        while perf_counter() < deadline:
+            request_started.send(sender=None)
+            started = perf_counter()
+
+            try:
+                operation()
+                local.append(perf_counter() - started)
+            except OperationalError:
+                errors += 1
+            finally:
+                request_finished.send(sender=None)
+
+        connections.close_all()
+
+        with lock:
+            results[samples].extend(local)
+            results["errors"] += errors
+
+    threads = [
+        threading.Thread(target=loop, args=(read, "reads"))
+        for _ in range(options.readers)
+    ] + [
+        threading.Thread(target=loop, args=(write, "writes"))
+        for _ in range(options.writers)
+    ]
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(
+        json.dumps(
+            {
+                "journal_mode": connection.cursor()
+                .execute("PRAGMA journal_mode")
+                .fetchone()[0],
+                "reads": len(results["reads"]),
+                "writes": len(results["writes"]),
+                "errors": results["errors"],
+                "connections": results["connections"],
+                "read_p95": percentiles(results["reads"] or [0])["p95"],
+                "write_p95": percentiles(results["writes"] or [0])["p95"],
+            }
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.profile:
+        return run_profile(options)
+
+    print(
+        "%d readers, %d writers, %.0fs per profile"
+        % (options.readers, options.writers, options.seconds)
+    )
+    print(
+        "%-12s %-8s %10s %10s %8s %12s %12s %12s"
+        % (
+            "profile",
+            "journal",
+            "reads/s",
+            "writes/s",
+            "errors",
+            "connections",
+            "read p95 ms",
+            "write p95 ms",
+        )
+    )
+
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(
+                os.environ,
+                DATABASE_PROFILE=profile,
+                DATABASE_NAME=os.path.join(directory, "benchmark.sqlite3"),
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.sqlite_profiles", "--profile"]
+                + [profile]
+                + sys.argv[1:],
+                env=env,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+
+        print(
+            "%-12s %-8s %10.0f %10.0f %8d %12d %12.2f %12.2f"
+            % (
+                profile,
+                result["journal_mode"],
+                result["reads"] / options.seconds,
+                result["writes"] / options.seconds,
+                result["errors"],
+                result["connections"],
+                result["read_p95"],
+                result["write_p95"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend tuned for a concurrently used production database.
+
+    Takes two extra ``OPTIONS`` on top of Django's:
+
+    - ``pragmas``: a ``{name: value}`` dict applied to every new connection,
+      e.g. WAL journaling, ``synchronous`` and ``busy_timeout``.
+    - ``transaction_mode``: ``"IMMEDIATE"`` makes ``atomic`` blocks take the
+      write lock when they start. With SQLite's default deferred
+      transactions a reader upgrading to a writer fails with "database is
+      locked" right away, without waiting for ``busy_timeout``.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pragmas", None)
+        params.pop("transaction_mode", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+
+        for name, value in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            conn.execute("PRAGMA %s = %s" % (name, value))
+
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute("BEGIN %s" % mode if mode else "BEGIN")
@@ -0,0 +1,278 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import uuid
+from datetime import datetime
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from users import instrumentation, metrics
+
+from . import routers
+
+logger = logging.getLogger(__name__)
+
+
+def view_name(request):
+    """URL name the request resolved to, empty when it did not resolve"""
+
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else ""
+
+
+class ReadYourWritesMiddleware:
+    """
+    Keeps a client on the primary database for a while after it wrote.
+
+    A request that writes gets a short-lived cookie back; while the client
+    presents it, its reads skip the replicas, so it sees its own changes
+    however far the replicas lag. Only installed with ``READ_REPLICAS``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    cookie_name = "pin_primary"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, "READ_REPLICA_PIN_SECONDS", 15)
+        self.async_mode = iscoroutinefunction(get_response)
+
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        pinned = routers.pinned_to_primary.set(self.cookie_name in request.COOKIES)
+        wrote = routers.wrote_to_primary.set(False)
+
+        try:
+            return self.pin(self.get_response(request))
+        finally:
+            routers.wrote_to_primary.reset(wrote)
+            routers.pinned_to_primary.reset(pinned)
+
+    async def __acall__(self, request):
+        pinned = routers.pinned_to_primary.set(self.cookie_name in request.COOKIES)
+        wrote = routers.wrote_to_primary.set(False)
+
+        try:
+            return self.pin(await self.get_response(request))
+        finally:
+            routers.wrote_to_primary.reset(wrote)
+            routers.pinned_to_primary.reset(pinned)
+
+    def pin(self, response):
+        if routers.wrote_to_primary.get():
+            response.set_cookie(
+                self.cookie_name,
+                "1",
+                max_age=self.pin_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and phase timings of every request in the metrics
+    registry served at ``/metrics``, labelled with the URL name it resolved
+    to. Goes first, so its latency covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # Any other method is counted as "other", label values stay bounded
+    methods = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started = perf_counter()
+
+        with instrumentation.collect() as timings:
+            response = self.get_response(request)
+
+        return self.observe(request, response, started, timings)
+
+    async def __acall__(self, request):
+        started = perf_counter()
+
+        with instrumentation.collect() as timings:
+            response = await self.get_response(request)
+
+        return self.observe(request, response, started, timings)
+
+    def observe(self, request, response, started, timings):
+        metrics.registry.observe(
+            view_name(request),
+            request.method if request.method in self.methods else "other",
+            response.status_code,
+            perf_counter() - started,
+            timings,
+        )
+
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a ``Server-Timing`` header with the time the request spent in each
+    phase, so browser dev tools show where a slow response went.
+
+    Opt-in through ``SERVER_TIMING``, the header tells clients how the
+    server spends its time.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    phases = ("db", "auth", "hash", "serialize", "mail")
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVER_TIMING", False):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        started = perf_counter()
+
+        with instrumentation.collect() as timings:
+            response = self.get_response(request)
+
+        return self.add_header(response, started, timings)
+
+    async def __acall__(self, request):
+        started = perf_counter()
+
+        with instrumentation.collect() as timings:
+            response = await self.get_response(request)
+
+        return self.add_header(response, started, timings)
+
+    def add_header(self, response, started, timings):
+        entries = [
+            "%s;dur=%.2f" % (name, timings.phases.get(name, 0.0) * 1000)
+            for name in self.phases
+        ]
+        entries.append("total;dur=%.2f" % ((perf_counter() - started) * 1000))
+        response["Server-Timing"] = ", ".join(entries)
+
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Runs cProfile around a sample of the requests.
+
+    ``PROFILING_SAMPLE_RATE`` of the requests are profiled at random, and
+    every request carrying ``PROFILING_HEADER`` set to ``PROFILING_SECRET``.
+    Profiles are written to ``PROFILING_DIR``, which keeps the latest
+    ``PROFILING_MAX_FILES``; open them with ``pstats`` or snakeviz. Goes
+    last, so the profile covers the view rather than the middleware.
+
+    It is sync only: once enabled, Django runs every request under ASGI in
+    a thread through it, async views included, so profiles show the sync
+    path only.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.secret = getattr(settings, "PROFILING_SECRET", None)
+
+        if not self.sample_rate and not self.secret:
+            raise MiddlewareNotUsed()
+
+        self.header = "HTTP_" + getattr(
+            settings, "PROFILING_HEADER", "X-Profile"
+        ).upper().replace("-", "_")
+        self.directory = settings.PROFILING_DIR
+        self.max_files = getattr(settings, "PROFILING_MAX_FILES", 100)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        try:
+            return self.get_response(request)
+        finally:
+            profiler.disable()
+
+            try:
+                self.save(profiler, request)
+            except OSError:
+                logger.exception("Could not save the profile of %s", request.path)
+
+    def wants_profile(self, request):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+
+        presented = request.META.get(self.header)
+
+        return bool(
+            self.secret
+            and presented
+            and hmac.compare_digest(presented.encode(), self.secret.encode())
+        )
+
+    def save(self, profiler, request):
+        os.makedirs(self.directory, exist_ok=True)
+
+        filename = "%s-%s-%s-%s.prof" % (
+            datetime.now().strftime("%Y%m%dT%H%M%S.%f"),
+            view_name(request).replace(":", "_") or "unresolved",
+            request.method,
+            uuid.uuid4().hex[:8],
+        )
+        profiler.dump_stats(os.path.join(self.directory, filename))
+        self.rotate()
+
+    def rotate(self):
+        """Deletes the oldest profiles beyond ``PROFILING_MAX_FILES``"""
+
+        # Names start with the time they were taken
+        profiles = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(".prof")
+        )
+
+        for name in profiles[: max(len(profiles) - self.max_files, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # Another worker rotated it first
+                pass
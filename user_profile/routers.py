@@ -0,0 +1,149 @@
+import threading
+from contextvars import ContextVar
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+
+from users import sharding
+
+PRIMARY = "default"
+
+# Set for the rest of the request once it wrote to the primary, or when the
+# client was pinned by an earlier write (see ``ReadYourWritesMiddleware``)
+pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+wrote_to_primary = ContextVar("wrote_to_primary", default=False)
+
+
+class ReplicaRouter:
+    """
+    Routes reads to the replicas in ``READ_REPLICAS`` and writes to primary.
+
+    Replicas are picked by smooth weighted round-robin. A replica that fails
+    to connect is skipped for ``READ_REPLICA_RETRY_INTERVAL`` seconds, and
+    with no replica available reads go to the primary. Reads also go to the
+    primary inside a transaction and once the current request or client has
+    written, so nobody reads a replica that has not caught up with their
+    own changes.
+    """
+
+    def __init__(self):
+        self.weights = dict(getattr(settings, "READ_REPLICAS", {}))
+        self.retry_interval = getattr(settings, "READ_REPLICA_RETRY_INTERVAL", 30)
+        self._current = dict.fromkeys(self.weights, 0)
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def db_for_read(self, model, **hints):
+        if (
+            not self.weights
+            or pinned_to_primary.get()
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+
+        tried = set()
+
+        while True:
+            alias = self.next_replica(exclude=tried)
+
+            if alias is None:
+                return PRIMARY
+
+            if self.is_available(alias):
+                return alias
+
+            tried.add(alias)
+
+    def db_for_write(self, model, **hints):
+        wrote_to_primary.set(True)
+        pinned_to_primary.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *self.weights}
+
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary along with the data
+        return db not in self.weights
+
+    def next_replica(self, exclude=()):
+        now = monotonic()
+
+        with self._lock:
+            candidates = [
+                alias
+                for alias in self.weights
+                if alias not in exclude and self._down_until.get(alias, 0) <= now
+            ]
+
+            if not candidates:
+                return None
+
+            total = 0
+            best = None
+
+            for alias in candidates:
+                self._current[alias] += self.weights[alias]
+                total += self.weights[alias]
+
+                if best is None or self._current[alias] > self._current[best]:
+                    best = alias
+
+            self._current[best] -= total
+            return best
+
+    def is_available(self, alias):
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            with self._lock:
+                self._down_until[alias] = monotonic() + self.retry_interval
+            return False
+
+        return True
+
+
+class ShardRouter:
+    """
+    Routes users, their tokens and permission links to the user's shard.
+
+    Only queries carrying a user or token instance can be routed here.
+    Lookups by email are routed by ``UserQuerySet``, lookups by token key
+    through ``users.tokens.for_key``, and everything else is fanned out to
+    every shard with the helpers in ``users.sharding``.
+    """
+
+    sharded_models = (
+        "users.User",
+        "users.User_groups",
+        "users.User_user_permissions",
+        "authtoken.Token",
+    )
+
+    def db_for_read(self, model, instance=None, **hints):
+        return self.db_for_instance(model, instance)
+
+    def db_for_write(self, model, instance=None, **hints):
+        return self.db_for_instance(model, instance)
+
+    def db_for_instance(self, model, instance):
+        if instance is None or model._meta.label not in self.sharded_models:
+            return None
+
+        if instance._state.db in sharding.shards():
+            return instance._state.db
+
+        if isinstance(instance, get_user_model()):
+            return sharding.shard_for_email(instance.email)
+
+        if instance._meta.label == "authtoken.Token" and instance.key:
+            return sharding.shard_for_token(instance.key)
+
+        return None
@@ -10,9 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "user_profile.middleware.MetricsMiddleware",
+    "user_profile.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -57,6 +60,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "user_profile.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "user_profile.urls"
@@ -83,13 +87,99 @@ WSGI_APPLICATION = "user_profile.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_PROFILE picks one of DATABASE_PROFILES. "production" keeps
+# connections open between requests and tunes SQLite for concurrent use:
+# WAL lets readers run alongside the writer, busy_timeout makes writers
+# queue for the lock instead of failing with "database is locked".
+DATABASE_PROFILE = config("DATABASE_PROFILE", default="default")
+DATABASE_NAME = config("DATABASE_NAME", default=str(BASE_DIR / "db.sqlite3"))
+# Milliseconds a writer waits for the database lock
+SQLITE_BUSY_TIMEOUT = config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int)
+
+DATABASE_PROFILES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "NAME": DATABASE_NAME,
+    },
+    "production": {
+        "ENGINE": "user_profile.backends.sqlite3",
+        "NAME": DATABASE_NAME,
+        "CONN_MAX_AGE": config("DATABASE_CONN_MAX_AGE", default=600, cast=int),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "busy_timeout": SQLITE_BUSY_TIMEOUT,
+                "mmap_size": config("SQLITE_MMAP_SIZE", default=268435456, cast=int),
+                # Negative values are KiB rather than pages
+                "cache_size": config("SQLITE_CACHE_SIZE", default=-65536, cast=int),
+                "temp_store": "MEMORY",
+            },
+        },
+    },
 }
 
+DATABASES = {"default": DATABASE_PROFILES[DATABASE_PROFILE]}
+
+# Read replicas, comma separated SQLite files kept in sync with the primary
+# by an external replication tool. Each becomes a "replica_<n>" database
+# opened read-only; READ_REPLICAS maps those aliases to their weight.
+DATABASE_REPLICAS = config("DATABASE_REPLICAS", default="", cast=Csv())
+DATABASE_REPLICA_WEIGHTS = config("DATABASE_REPLICA_WEIGHTS", default="", cast=Csv(int))
+READ_REPLICAS = {}
+
+for index, path in enumerate(DATABASE_REPLICAS):
+    alias = "replica_%d" % (index + 1)
+    options = dict(DATABASES["default"].get("OPTIONS", {}))
+    if "pragmas" in options:
+        # The journal mode cannot be changed over a read-only connection
+        options["pragmas"] = {
+            name: value
+            for name, value in options["pragmas"].items()
+            if name != "journal_mode"
+        }
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "NAME": "file:%s?mode=ro" % path,
+        "OPTIONS": options,
+        "TEST": {"MIRROR": "default"},
+    }
+    READ_REPLICAS[alias] = (
+        DATABASE_REPLICA_WEIGHTS[index] if index < len(DATABASE_REPLICA_WEIGHTS) else 1
+    )
+
+# Seconds a failed replica is skipped before it is tried again
+READ_REPLICA_RETRY_INTERVAL = config(
+    "READ_REPLICA_RETRY_INTERVAL", default=30, cast=int
+)
+# Seconds a client keeps reading from the primary after a write
+READ_REPLICA_PIN_SECONDS = config("READ_REPLICA_PIN_SECONDS", default=15, cast=int)
+
+# User shards, comma separated SQLite files becoming "shard_<n>" databases.
+# Users and their tokens live on the shard picked by hashing their email;
+# everything else stays on the default database. New shards must be
+# appended and followed by `manage.py rebalance_shards`.
+DATABASE_SHARDS = config("DATABASE_SHARDS", default="", cast=Csv())
+USER_SHARDS = []
+
+for index, path in enumerate(DATABASE_SHARDS):
+    alias = "shard_%d" % (index + 1)
+    DATABASES[alias] = {**DATABASES["default"], "NAME": path}
+    USER_SHARDS.append(alias)
+
+DATABASE_ROUTERS = []
+if USER_SHARDS:
+    DATABASE_ROUTERS.append("user_profile.routers.ShardRouter")
+if READ_REPLICAS:
+    DATABASE_ROUTERS.append("user_profile.routers.ReplicaRouter")
+    # Right after SecurityMiddleware, before anything that may query
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+        "user_profile.middleware.ReadYourWritesMiddleware",
+    )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -117,9 +207,18 @@ PASSWORD_HASHERS = [
 
 # User Authentication
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
+    "users.backends.PooledModelBackend",
 ]
 
+# Password hashing process pool, 0 workers hashes inline in the request thread
+PASSWORD_HASHING_WORKERS = config("PASSWORD_HASHING_WORKERS", default=2, cast=int)
+PASSWORD_HASHING_QUEUE_DEPTH = config(
+    "PASSWORD_HASHING_QUEUE_DEPTH", default=64, cast=int
+)
+PASSWORD_HASHING_QUEUE_TIMEOUT = config(
+    "PASSWORD_HASHING_QUEUE_TIMEOUT", default=5.0, cast=float
+)
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -146,7 +245,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Rest framework configurations
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.StatelessJWTAuthentication",
+        "users.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     )
@@ -154,10 +254,138 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = "users.User"
 
+# Caches. "shared" holds what every process must agree on, the JWT denylist
+# and the user profile versions. It is file based by default, shared by the
+# processes of one host; point SHARED_CACHE_BACKEND and SHARED_CACHE_LOCATION
+# at Redis or Memcached when serving from more.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": config(
+            "SHARED_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": config(
+            "SHARED_CACHE_LOCATION", default=str(BASE_DIR / "shared_cache")
+        ),
+    },
+}
+
+# Serialized user profiles cache, per process, 0 disables it. Saving a user
+# stamps its version in the Django cache named by USER_CACHE_ALIAS, checked
+# on every hit, so no process serves a profile another one changed. Left
+# empty, a process only sees its own changes before USER_CACHE_TTL runs out.
+USER_CACHE_SIZE = config("USER_CACHE_SIZE", default=10000, cast=int)
+USER_CACHE_TTL = config("USER_CACHE_TTL", default=60, cast=int)
+USER_CACHE_ALIAS = config("USER_CACHE_ALIAS", default="shared") or None
+
+# Bulk registration
+BULK_REGISTRATION_MAX_SIZE = config(
+    "BULK_REGISTRATION_MAX_SIZE", default=1000, cast=int
+)
+BULK_REGISTRATION_CHUNK_SIZE = config(
+    "BULK_REGISTRATION_CHUNK_SIZE", default=500, cast=int
+)
+
+# Token authentication cache, per process and optionally shared through the
+# Django cache named by TOKEN_CACHE_ALIAS
+TOKEN_CACHE_SIZE = config("TOKEN_CACHE_SIZE", default=10000, cast=int)
+TOKEN_CACHE_TTL = config("TOKEN_CACHE_TTL", default=30, cast=int)
+TOKEN_CACHE_ALIAS = config("TOKEN_CACHE_ALIAS", default="") or None
+TOKEN_CACHE_SHARED_TTL = config("TOKEN_CACHE_SHARED_TTL", default=300, cast=int)
+# Tokens unused for TOKEN_TTL seconds expire, 0 keeps them forever; using a
+# token restarts its lifetime, written at most every TOKEN_REFRESH_INTERVAL
+# seconds. Expired tokens are deleted by `manage.py purge_tokens`.
+TOKEN_TTL = config("TOKEN_TTL", default=2592000, cast=int)
+TOKEN_REFRESH_INTERVAL = config("TOKEN_REFRESH_INTERVAL", default=86400, cast=int)
+# Most tokens accepted by a single batch verification request
+TOKEN_BATCH_MAX_SIZE = config("TOKEN_BATCH_MAX_SIZE", default=100, cast=int)
+
+# Lifetime in seconds of the signed links mailed to verify an email address
+# and to reset a password
+EMAIL_VERIFICATION_TIMEOUT = config(
+    "EMAIL_VERIFICATION_TIMEOUT", default=259200, cast=int
+)
+PASSWORD_RESET_TIMEOUT = config("PASSWORD_RESET_TIMEOUT", default=3600, cast=int)
+
+# Stateless JSON Web Tokens, verified by signature. Revoked tokens are kept
+# in the Django cache named by JWT_DENYLIST_CACHE, which must be shared by
+# every process for revocations to apply everywhere; a per-process cache
+# fails `manage.py check`.
+SIMPLE_JWT = {
+    "ACCESS_TOKEN_LIFETIME": timedelta(
+        seconds=config("JWT_ACCESS_TOKEN_LIFETIME", default=300, cast=int)
+    ),
+    "REFRESH_TOKEN_LIFETIME": timedelta(
+        seconds=config("JWT_REFRESH_TOKEN_LIFETIME", default=86400, cast=int)
+    ),
+    "SIGNING_KEY": config("JWT_SIGNING_KEY", default=SECRET_KEY),
+    "UPDATE_LAST_LOGIN": False,
+    "TOKEN_USER_CLASS": "users.authentication.JWTUser",
+}
+JWT_DENYLIST_CACHE = config("JWT_DENYLIST_CACHE", default="shared")
+
+# Users list pagination
+USERS_PAGE_SIZE = config("USERS_PAGE_SIZE", default=100, cast=int)
+USERS_MAX_PAGE_SIZE = config("USERS_MAX_PAGE_SIZE", default=1000, cast=int)
+
+# Batch user lookup, at most USERS_LOOKUP_MAX_SIZE emails and ids per request
+# read with IN queries of at most USERS_LOOKUP_CHUNK_SIZE values
+USERS_LOOKUP_MAX_SIZE = config("USERS_LOOKUP_MAX_SIZE", default=1000, cast=int)
+USERS_LOOKUP_CHUNK_SIZE = config("USERS_LOOKUP_CHUNK_SIZE", default=500, cast=int)
+
+# Users search, USERS_SEARCH_BACKEND defaults to FTS5 on SQLite and to plain
+# prefix indexes on other databases
+USERS_SEARCH_BACKEND = config("USERS_SEARCH_BACKEND", default="") or None
+USERS_SEARCH_LIMIT = config("USERS_SEARCH_LIMIT", default=20, cast=int)
+USERS_SEARCH_MAX_LIMIT = config("USERS_SEARCH_MAX_LIMIT", default=100, cast=int)
+
+# Users bulk export
+USERS_EXPORT_CHUNK_SIZE = config("USERS_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Prometheus metrics served at /metrics to METRICS_ALLOWED_IPS. With
+# METRICS_DIR set, every process writes its counters to a file there at
+# most every METRICS_FLUSH_INTERVAL seconds and a scrape adds them all up;
+# the directory should be emptied when the application is redeployed.
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1,::1", cast=Csv())
+METRICS_DIR = config("METRICS_DIR", default="") or None
+METRICS_FLUSH_INTERVAL = config("METRICS_FLUSH_INTERVAL", default=5.0, cast=float)
+
+# Server-Timing response header with the db, auth, hash, serialize and mail
+# phases of every request
+SERVER_TIMING = config("SERVER_TIMING", default=False, cast=bool)
+
+# cProfile of PROFILING_SAMPLE_RATE of the requests, and of those sending
+# PROFILING_HEADER set to PROFILING_SECRET, kept in PROFILING_DIR up to the
+# latest PROFILING_MAX_FILES. The profiling middleware is sync only, enabling
+# it makes ASGI run every request, async views included, in a thread.
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+PROFILING_HEADER = config("PROFILING_HEADER", default="X-Profile")
+PROFILING_SECRET = config("PROFILING_SECRET", default="") or None
+PROFILING_DIR = config("PROFILING_DIR", default=str(BASE_DIR / "profiles"))
+PROFILING_MAX_FILES = config("PROFILING_MAX_FILES", default=100, cast=int)
+
 # Email settings
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_BACKEND = config(
+    "EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend"
+)
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_USE_TLS = True
 EMAIL_PORT = 587
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
+EMAIL_TIMEOUT = config("EMAIL_TIMEOUT", default=30, cast=int)
+# Seconds a pooled email connection may sit idle before it is reopened
+EMAIL_CONNECTION_MAX_IDLE = config("EMAIL_CONNECTION_MAX_IDLE", default=60, cast=int)
+
+# Email outbox, drained by `manage.py process_outbox`
+OUTBOX_WORKERS = config("OUTBOX_WORKERS", default=4, cast=int)
+OUTBOX_BATCH_SIZE = config("OUTBOX_BATCH_SIZE", default=50, cast=int)
+OUTBOX_POLL_INTERVAL = config("OUTBOX_POLL_INTERVAL", default=1.0, cast=float)
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+OUTBOX_RETRY_BACKOFF = config("OUTBOX_RETRY_BACKOFF", default=30, cast=int)
+OUTBOX_MAX_BACKOFF = config("OUTBOX_MAX_BACKOFF", default=3600, cast=int)
+OUTBOX_LEASE = config("OUTBOX_LEASE", default=300, cast=int)
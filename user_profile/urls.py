@@ -18,4 +18,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
-urlpatterns = [path("admin/", admin.site.urls), path("users/", include("users.urls"))]
+from users.views import metrics_view
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("users/", include("users.urls")),
+    path("metrics", metrics_view, name="metrics"),
+]
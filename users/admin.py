@@ -6,3 +6,4 @@ from . import models
 # Register your models here.
 admin.site.unregister(Group)
 admin.site.register(models.User)
+admin.site.register(models.OutboxMessage)
@@ -0,0 +1,34 @@
+from django.urls import path
+
+from . import async_views
+
+urlpatterns = [
+    path("register/", async_views.RegistrationView.as_view(), name="registration"),
+    path(
+        "user/<str:email>/",
+        async_views.RetrieveUserView.as_view(),
+        name="retrieve-user",
+    ),
+    path("token/", async_views.AuthTokenView.as_view(), name="token"),
+    path("verify-token/", async_views.VerifyTokenView.as_view(), name="verify-token"),
+    path(
+        "verify-email/<str:token>/",
+        async_views.EmailVerificationView.as_view(),
+        name="verify-email",
+    ),
+    path(
+        "send-verification-email/",
+        async_views.SendEmailVerificationView.as_view(),
+        name="send-verification-email",
+    ),
+    path(
+        "send-password-reset-link/",
+        async_views.SendPasswordResetEmailView.as_view(),
+        name="send-password-reset-link",
+    ),
+    path(
+        "reset-password/<str:token>/",
+        async_views.PasswordResetView.as_view(),
+        name="reset-password",
+    ),
+]
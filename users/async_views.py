@@ -0,0 +1,308 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.sites.shortcuts import get_current_site
+from django.db import IntegrityError
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework.exceptions import ValidationError
+
+from . import (
+    authentication,
+    emails,
+    hashing,
+    jwt_tokens,
+    links,
+    outbox,
+    profiles,
+    serializers,
+    tokens,
+)
+from .backends import PooledModelBackend
+from .hashing import HashingUnavailable
+from .views import jwt_payload, token_payload
+
+# Async counterparts of the views in ``views.py``, served under ``async/``.
+#
+# DRF views are synchronous, under ASGI every request to them holds a thread
+# for its whole duration. These are plain Django async views: database work
+# goes through the async ORM and emails are queued with ``outbox.aenqueue``,
+# so a waiting request costs a coroutine rather than a thread. Payloads and
+# status codes match the synchronous views; DRF serializers are still used
+# for validation since it does not touch the database.
+
+
+class AsyncAPIView(View):
+    """Base class for the async API views, JSON in and JSON out"""
+
+    http_method_names = ["get", "post", "head", "options"]
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated API, like the DRF views
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except HashingUnavailable as error:
+            return JsonResponse({"detail": error.detail}, status=error.status_code)
+
+    def get_data(self):
+        if self.request.content_type == "application/json":
+            try:
+                return json.loads(self.request.body or b"{}")
+            except ValueError:
+                return None
+
+        return self.request.POST
+
+    def validate(self, serializer_class):
+        """Returns ``(validated_data, None)`` or ``(None, error_response)``"""
+
+        data = self.get_data()
+
+        if not isinstance(data, dict) and not hasattr(data, "getlist"):
+            # Malformed JSON, or JSON that is not an object
+            return None, JsonResponse({"detail": _("JSON parse error")}, status=400)
+
+        serializer = serializer_class(data=data)
+
+        if not serializer.is_valid():
+            return None, JsonResponse(serializer.errors, status=400)
+
+        return serializer.validated_data, None
+
+
+class RegistrationView(AsyncAPIView):
+    """Async API view responsible for user registration"""
+
+    async def post(self, request):
+
+        attrs, error = self.validate(serializers.BulkUserSerializer)
+        if error:
+            return error
+
+        User = get_user_model()
+        email = User.objects.normalize_email(attrs["email"])
+        taken = JsonResponse(
+            {"email": [_("user with this email already exists.")]}, status=400
+        )
+
+        if await User.objects.filter(email=email).aexists():
+            return taken
+
+        user = User(
+            email=email,
+            first_name=attrs["first_name"],
+            last_name=attrs["last_name"],
+            password=await hashing.amake_password(attrs["password"]),
+        )
+
+        try:
+            await user.asave()
+        except IntegrityError:
+            return taken
+
+        await outbox.aenqueue(
+            emails.account_verification_email(
+                get_current_site(request).domain,
+                user,
+                links.email_verification.make_link_token(user),
+            )
+        )
+
+        return JsonResponse(
+            {
+                "status": _("Verify your email"),
+                "user": serializers.UserSerializer(user).data,
+            },
+            status=201,
+        )
+
+
+class RetrieveUserView(AsyncAPIView):
+    """Async API view responsible for retrieving a user"""
+
+    async def get(self, request, email):
+
+        try:
+            fields = serializers.UserValuesSerializer.requested_fields(request.GET)
+        except ValidationError as error:
+            return JsonResponse(error.detail, status=400)
+
+        payload = await profiles.aget_by_email(email, fields)
+
+        if payload is None:
+            return JsonResponse({"detail": _("Not found.")}, status=404)
+
+        return JsonResponse(payload)
+
+
+class AuthTokenView(AsyncAPIView):
+    """Async API view responsible for obtaining authentication token"""
+
+    async def post(self, request):
+
+        attrs, error = self.validate(serializers.CredentialsSerializer)
+        if error:
+            return error
+
+        user = await PooledModelBackend().aauthenticate(
+            request, username=attrs["email"], password=attrs["password"]
+        )
+
+        if not user:
+            msg = _("Validation failed, invalid credentials")
+        elif not user.is_active:
+            msg = _("User is blocked, please contact admin.")
+        elif not user.is_verified:
+            msg = _("Email is not verified, please verify your email.")
+        else:
+            token, created_at = await tokens.aget_or_create(user)
+            return JsonResponse(token_payload(user, token))
+
+        return JsonResponse({"non_field_errors": [msg]}, status=400)
+
+
+class VerifyTokenView(AsyncAPIView):
+    """Async API view responsible for verifying token"""
+
+    async def post(self, request):
+
+        attrs, error = self.validate(serializers.TokenVerificationSerializer)
+        if error:
+            return error
+
+        if jwt_tokens.looks_like_jwt(attrs["token"]):
+            access = jwt_tokens.verify(attrs["token"])
+
+            if access is None:
+                return JsonResponse({"status": "Invalid Token"})
+
+            return JsonResponse({"status": "Valid Token", **jwt_payload(access)})
+
+        resolved = await authentication.aresolve_token(attrs["token"])
+
+        if resolved is None:
+            return JsonResponse({"status": "Invalid Token"})
+
+        user, user_token = resolved
+
+        return JsonResponse(
+            {"status": "Valid Token", **token_payload(user, user_token)}
+        )
+
+
+class EmailVerificationView(AsyncAPIView):
+    """Async API view responsible for user email verification"""
+
+    async def get(self, request, token):
+
+        user = await links.email_verification.aget_user(token)
+
+        if user is None:
+            return JsonResponse({"status": _("Invalid Token")}, status=400)
+
+        if not user.is_verified:
+            user.is_verified = True
+            user.is_active = True
+            await user.asave()
+
+        return JsonResponse(
+            {
+                "status": _("Email successfully verified"),
+                "user": {
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                    "email": user.email,
+                    "is_verified": user.is_verified,
+                },
+            }
+        )
+
+
+class SendEmailView(AsyncAPIView):
+    """Base class for the views mailing a token link to a user"""
+
+    serializer_class = None
+    build_email = None
+    link_tokens = None
+    success_message = None
+
+    async def post(self, request):
+
+        attrs, error = self.validate(self.serializer_class)
+        if error:
+            return error
+
+        try:
+            user = await get_user_model().objects.aget(email=attrs["email"])
+        except get_user_model().DoesNotExist:
+            return JsonResponse(
+                {"status": _("User with given email does not exist")}, status=400
+            )
+
+        await outbox.aenqueue(
+            type(self).build_email(
+                get_current_site(request).domain,
+                user,
+                self.link_tokens.make_link_token(user),
+            )
+        )
+
+        return JsonResponse({"status": self.success_message})
+
+
+class SendEmailVerificationView(SendEmailView):
+    """Async API view responsible for sending email verification"""
+
+    serializer_class = serializers.SendEmailVerificationSerializer
+    build_email = emails.email_verification_email
+    link_tokens = links.email_verification
+    success_message = _("Email verification sent successfully")
+
+
+class SendPasswordResetEmailView(SendEmailView):
+    """Async API view for sending password reset email"""
+
+    serializer_class = serializers.SendPasswordResetEmailSerializer
+    build_email = emails.password_reset_email
+    link_tokens = links.password_reset
+    success_message = _("Reset email sent successfully")
+
+
+class PasswordResetView(AsyncAPIView):
+    """Async API view for resetting user password"""
+
+    async def get(self, request, token):
+
+        if await links.password_reset.aget_user(token) is None:
+            return JsonResponse(
+                {"status": _("Invalid token, please try again")}, status=400
+            )
+
+        return JsonResponse({"status": "valid"})
+
+    async def post(self, request, token):
+
+        attrs, error = self.validate(serializers.ResetPasswordSerializer)
+        if error:
+            return error
+
+        user = await links.password_reset.aget_user(token)
+
+        if user is None:
+            return JsonResponse(
+                {"status": _("Invalid token, please try again")}, status=400
+            )
+        user.password = await hashing.amake_password(attrs["confirm_password"])
+        await user.asave()
+        await tokens.arotate(user)
+        await jwt_tokens.arevoke_user(user)
+
+        return JsonResponse({"status": _("Password successfully reset")})
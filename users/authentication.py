@@ -0,0 +1,300 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+
+from . import jwt_tokens, sharding, tokens
+from .caching import TTLCache
+from .instrumentation import phase
+
+SHARED_KEY_PREFIX = "users:token:"
+
+_local_tokens = TTLCache(
+    max_size=getattr(settings, "TOKEN_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "TOKEN_CACHE_TTL", 30),
+)
+
+
+def _shared_cache():
+    alias = getattr(settings, "TOKEN_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def resolve_token(key):
+    """
+    Returns the ``(user, token)`` pair for a token key, or ``None``.
+
+    Lookups go through a per-process LRU cache first, then through the
+    shared Django cache named by ``TOKEN_CACHE_ALIAS`` (if any), and only
+    then to the database with a single ``Token`` + ``User`` join. Callers
+    get their own copy of the user, so the cached instance is never mutated.
+
+    Expired tokens resolve to ``None``. Using a token slides its expiry
+    forward, written at most every ``TOKEN_REFRESH_INTERVAL`` seconds.
+    """
+
+    entry = _local_tokens.get(key)
+
+    if entry is None:
+        shared = _shared_cache()
+        entry = shared.get(SHARED_KEY_PREFIX + key) if shared is not None else None
+
+        if entry is None:
+            try:
+                token = tokens.for_key(key).select_related("user").get(key=key)
+            except Token.DoesNotExist:
+                return None
+
+            entry = (token.user, token)
+
+            if shared is not None:
+                shared.set(
+                    SHARED_KEY_PREFIX + key,
+                    entry,
+                    getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+                )
+
+        _local_tokens.set(key, entry)
+
+    user, token = entry
+    now = timezone.now()
+
+    if tokens.is_expired(token, now):
+        return None
+
+    if tokens.is_stale(token, now):
+        tokens.refresh([token])
+        _share(key, entry)
+
+    return copy.copy(user), token
+
+
+async def aresolve_token(key):
+    """Async variant of ``resolve_token``"""
+
+    entry = _local_tokens.get(key)
+
+    if entry is None:
+        shared = _shared_cache()
+        entry = (
+            await shared.aget(SHARED_KEY_PREFIX + key) if shared is not None else None
+        )
+
+        if entry is None:
+            try:
+                token = await tokens.for_key(key).select_related("user").aget(key=key)
+            except Token.DoesNotExist:
+                return None
+
+            entry = (token.user, token)
+
+            if shared is not None:
+                await shared.aset(
+                    SHARED_KEY_PREFIX + key,
+                    entry,
+                    getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+                )
+
+        _local_tokens.set(key, entry)
+
+    user, token = entry
+    now = timezone.now()
+
+    if tokens.is_expired(token, now):
+        return None
+
+    if tokens.is_stale(token, now):
+        await tokens.arefresh(token)
+        shared = _shared_cache()
+        if shared is not None:
+            await shared.aset(
+                SHARED_KEY_PREFIX + key,
+                entry,
+                getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+            )
+
+    return copy.copy(user), token
+
+
+def resolve_tokens(keys):
+    """
+    Resolves many token keys at once into a ``{key: (user, token)}`` dict.
+
+    Keys missing from both cache layers are fetched together with a single
+    ``Token`` + ``User`` join per shard; unknown and expired keys are left
+    out of the result.
+    """
+
+    keys = list(dict.fromkeys(keys))
+    entries = {}
+
+    for key in keys:
+        entry = _local_tokens.get(key)
+        if entry is not None:
+            entries[key] = entry
+
+    missing = [key for key in keys if key not in entries]
+    shared = _shared_cache()
+
+    if missing and shared is not None:
+        found = shared.get_many([SHARED_KEY_PREFIX + key for key in missing])
+
+        for key in missing:
+            entry = found.get(SHARED_KEY_PREFIX + key)
+            if entry is not None:
+                entries[key] = entry
+                _local_tokens.set(key, entry)
+
+        missing = [key for key in missing if key not in entries]
+
+    if missing:
+        shards = {}
+        for key in missing:
+            shards.setdefault(sharding.shard_for_token(key), []).append(key)
+
+        fetched = {
+            token.key: (token.user, token)
+            for alias, shard_keys in shards.items()
+            for token in Token.objects.using(alias)
+            .select_related("user")
+            .filter(key__in=shard_keys)
+        }
+
+        if shared is not None and fetched:
+            shared.set_many(
+                {SHARED_KEY_PREFIX + key: entry for key, entry in fetched.items()},
+                getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+            )
+
+        for key, entry in fetched.items():
+            _local_tokens.set(key, entry)
+
+        entries.update(fetched)
+
+    now = timezone.now()
+    entries = {
+        key: entry
+        for key, entry in entries.items()
+        if not tokens.is_expired(entry[1], now)
+    }
+    stale = [key for key, entry in entries.items() if tokens.is_stale(entry[1], now)]
+
+    if stale:
+        tokens.refresh([entries[key][1] for key in stale])
+
+        for key in stale:
+            _share(key, entries[key])
+
+    return {key: (copy.copy(user), token) for key, (user, token) in entries.items()}
+
+
+def _share(key, entry):
+    shared = _shared_cache()
+
+    if shared is not None:
+        shared.set(
+            SHARED_KEY_PREFIX + key,
+            entry,
+            getattr(settings, "TOKEN_CACHE_SHARED_TTL", 300),
+        )
+
+
+def invalidate_token(key):
+    """Forgets a single token key in every cache layer"""
+
+    _local_tokens.delete(key)
+
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(SHARED_KEY_PREFIX + key)
+
+
+def invalidate_user(user):
+    """
+    Forgets every cached token of ``user``.
+
+    The shared cache is cleared for all of the user's keys; other processes
+    drop their local copies once ``TOKEN_CACHE_TTL`` runs out.
+    """
+
+    _local_tokens.delete_where(lambda entry: entry[0].pk == user.pk)
+
+    shared = _shared_cache()
+    if shared is not None:
+        keys = (
+            Token.objects.using(sharding.db_for_user(user))
+            .filter(user_id=user.pk)
+            .values_list("key", flat=True)
+        )
+        shared.delete_many([SHARED_KEY_PREFIX + key for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication answered from the token cache.
+
+    Behaves exactly like DRF's ``TokenAuthentication`` but costs no database
+    round-trip once a token is warm in the cache.
+    """
+
+    @phase("auth")
+    def authenticate_credentials(self, key):
+        resolved = resolve_token(key)
+
+        if resolved is None:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        user, token = resolved
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return (user, token)
+
+
+class JWTUser(TokenUser):
+    """User built from the claims of an access token, without a query"""
+
+    @property
+    def email(self):
+        return self.token.get("email", "")
+
+    @property
+    def first_name(self):
+        return self.token.get("first_name", "")
+
+    @property
+    def last_name(self):
+        return self.token.get("last_name", "")
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication answered from the token alone.
+
+    The signature, expiry and denylist are checked and the user is a
+    ``JWTUser`` read from the claims, so no database round-trip is made.
+    Only ``Bearer`` headers are handled, ``Token`` keys are left to
+    ``CachedTokenAuthentication``.
+    """
+
+    @phase("auth")
+    def authenticate(self, request):
+        return super().authenticate(request)
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+
+        if jwt_tokens.is_revoked(token):
+            raise InvalidToken(_("Token is revoked"))
+
+        return token
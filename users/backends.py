@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import hashing
+from .instrumentation import phase
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that verifies passwords in the hashing process pool.
+
+    Unknown users still pay for one hash, as with Django's backend, so
+    response times do not reveal which emails are registered.
+    """
+
+    @phase("auth")
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            hashing.make_password(password)
+            return None
+
+        if hashing.check_password(user, password) and self.user_can_authenticate(user):
+            return user
+
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """Async variant of ``authenticate`` for the ASGI views"""
+
+        with phase("auth"):
+            UserModel = get_user_model()
+
+            if username is None:
+                username = kwargs.get(UserModel.USERNAME_FIELD)
+
+            if username is None or password is None:
+                return None
+
+            user = await UserModel._default_manager.filter(
+                **{UserModel.USERNAME_FIELD: username}
+            ).afirst()
+
+            if user is None:
+                await hashing.amake_password(password)
+                return None
+
+            if await hashing.acheck_password(
+                user, password
+            ) and self.user_can_authenticate(user):
+                return user
+
+            return None
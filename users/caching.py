@@ -0,0 +1,257 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+_missing = object()
+
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after ``ttl``
+    seconds.
+
+    Meant for small per-process caches in front of hot lookups; it never
+    talks to the database or to Django's cache framework by itself.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _missing)
+
+            if entry is _missing:
+                return default
+
+            expires_at, value = entry
+
+            if expires_at <= monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if self.max_size <= 0:
+            return
+
+        expires_at = monotonic() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Drops every entry whose value matches ``predicate``"""
+
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+
+            for key in stale:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReadThroughCache:
+    """
+    ``TTLCache`` that loads missing entries itself.
+
+    Concurrent misses for the same key are coalesced: the first caller runs
+    the loader while the others wait for its result, so a burst of requests
+    for one cold key costs a single load. Hits, misses, loads and coalesced
+    waits are counted.
+
+    ``is_current(values)``, and its async variant ``ais_current``, tell for
+    a list of cached values which may still be handed out; the others are
+    dropped and count as misses. They let other processes void this one's
+    copies.
+    """
+
+    def __init__(self, max_size, ttl, is_current=None, ais_current=None):
+        self.entries = TTLCache(max_size=max_size, ttl=ttl)
+        self.is_current = is_current
+        self.ais_current = ais_current
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.waits = 0
+        self._flights = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Returns ``{key: value}`` for the ``keys`` cached, checked at once"""
+
+        found = self._cached(keys)
+
+        if found and self.is_current is not None:
+            self._drop_stale(found, self.is_current(list(found.values())))
+
+        return self._count(keys, found)
+
+    async def aget(self, key):
+        """Async variant of ``get``, checks the value with ``ais_current``"""
+
+        found = self._cached([key])
+
+        if found and self.ais_current is not None:
+            self._drop_stale(found, await self.ais_current(list(found.values())))
+
+        return self._count([key], found).get(key)
+
+    def _cached(self, keys):
+        found = {}
+
+        for key in keys:
+            value = self.entries.get(key, _missing)
+
+            if value is not _missing:
+                found[key] = value
+
+        return found
+
+    def _drop_stale(self, found, current):
+        for (key, value), is_current in zip(list(found.items()), current):
+            if not is_current:
+                del found[key]
+                self.entries.delete_where(lambda cached: cached is value)
+
+    def _count(self, keys, found):
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for ``key``, calling ``loader()`` on a miss.
+
+        ``loader`` returns ``None`` for missing objects, which is not cached,
+        or ``(value, keys)`` to store ``value`` under every key in ``keys``.
+        """
+
+        value = self.entries.get(key, _missing)
+
+        if (
+            value is not _missing
+            and self.is_current is not None
+            and not self.is_current([value])[0]
+        ):
+            self.entries.delete_where(lambda cached: cached is value)
+            value = _missing
+
+        with self._lock:
+            if value is not _missing:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+            else:
+                self.waits += 1
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.value
+
+        try:
+            loaded = loader()
+
+            with self._lock:
+                self.loads += 1
+
+                # An invalidation while the loader ran may have made its
+                # result stale, it is handed out but not cached then.
+                if loaded is not None and generation == self._generation:
+                    value, keys = loaded
+                    for cache_key in keys:
+                        self.entries.set(cache_key, value)
+
+            flight.value = None if loaded is None else loaded[0]
+            return flight.value
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def put(self, value, keys, generation):
+        """
+        Stores a value loaded outside of ``get_or_load``.
+
+        ``generation`` is the value of ``self.generation`` read before the
+        load started; the value is dropped if an invalidation happened since.
+        """
+
+        with self._lock:
+            self.loads += 1
+
+            if generation == self._generation:
+                for key in keys:
+                    self.entries.set(key, value)
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            self._generation += 1
+
+        self.entries.delete_where(predicate)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+
+        self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "waits": self.waits,
+            }
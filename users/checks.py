@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+from rest_framework.settings import api_settings
+
+from .authentication import StatelessJWTAuthentication
+
+
+def _unshared(setting, alias, consequence, ids):
+    """Errors when the cache ``alias`` named by ``setting`` is not shared"""
+
+    try:
+        cache = caches[alias]
+    except InvalidCacheBackendError:
+        return [
+            Error(
+                "%s names the cache %r, which is not in CACHES." % (setting, alias),
+                id=ids[0],
+            )
+        ]
+
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return [
+            Error(
+                "The cache %r named by %s is not shared between processes, %s."
+                % (alias, setting, consequence),
+                hint="Point %s at a shared cache, such as Redis, Memcached, the "
+                "database or files." % setting,
+                id=ids[1],
+            )
+        ]
+
+    return []
+
+
+@register()
+def check_jwt_denylist(app_configs, **kwargs):
+    """
+    JWT revocations are only seen by the processes sharing the denylist
+    cache, a per-process cache would let revoked tokens through elsewhere.
+    """
+
+    if not any(
+        issubclass(auth, StatelessJWTAuthentication)
+        for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ):
+        return []
+
+    return _unshared(
+        "JWT_DENYLIST_CACHE",
+        getattr(settings, "JWT_DENYLIST_CACHE", "shared"),
+        "revoked tokens would stay valid",
+        ("users.E001", "users.E002"),
+    )
+
+
+@register()
+def check_user_cache(app_configs, **kwargs):
+    """
+    Profile versions stamped in a per-process cache would not reach the
+    other processes, which would keep serving their stale copies.
+    """
+
+    alias = getattr(settings, "USER_CACHE_ALIAS", None)
+
+    if not alias or getattr(settings, "USER_CACHE_SIZE", 10000) <= 0:
+        return []
+
+    return _unshared(
+        "USER_CACHE_ALIAS",
+        alias,
+        "other processes would serve stale profiles",
+        ("users.E003", "users.E004"),
+    )
@@ -0,0 +1,46 @@
+from django.urls import reverse
+
+
+def account_verification_email(domain, user, token):
+    """Email asking a newly registered user to verify their address"""
+
+    relativeLink = reverse("verify-email", kwargs={"token": token})
+    verification_link = "http://" + domain + relativeLink
+    message = ". Use this link to verify your email. \n If you were not expecting account verification email, please ignore this message \n."
+    email_body = "Hi " + user.first_name + message + verification_link
+
+    return {
+        "email_body": email_body,
+        "email_subject": "Verify you account",
+        "to_email": [user.email],
+    }
+
+
+def email_verification_email(domain, user, token):
+    """Email carrying a fresh link to verify the user's address"""
+
+    relativeLink = reverse("verify-email", kwargs={"token": token})
+    verification_link = "http://" + domain + relativeLink
+    message = ". Use this link to verify your email. \n If you were not expecting any email verification, please ignore this message. \n"
+    email_body = "Hi " + user.first_name + message + verification_link
+
+    return {
+        "email_subject": "Email Verification",
+        "email_body": email_body,
+        "to_email": [user.email],
+    }
+
+
+def password_reset_email(domain, user, token):
+    """Email carrying the link to reset the user's password"""
+
+    relativeLink = reverse("reset-password", kwargs={"token": token})
+    absolute_url = "http://" + domain + relativeLink
+    message = ". Use this link to reset your password. \n"
+    email_body = "Hi " + user.first_name + message + absolute_url + "\n"
+
+    return {
+        "email_subject": "Reset Password",
+        "email_body": email_body,
+        "to_email": [user.email],
+    }
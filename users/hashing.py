@@ -0,0 +1,301 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from time import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+
+from .instrumentation import phase
+
+
+class HashingUnavailable(exceptions.APIException):
+    status_code = 503
+    default_detail = _("Server is busy, please try again later.")
+    default_code = "hashing_unavailable"
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+
+    import django
+
+    django.setup()
+
+
+def _make_password(password, submitted_at):
+    started_at = time()
+    encoded = hashers.make_password(password)
+    return encoded, submitted_at, started_at, time()
+
+
+def _make_passwords(passwords, submitted_at):
+    started_at = time()
+    encoded = [hashers.make_password(password) for password in passwords]
+    return encoded, submitted_at, started_at, time()
+
+
+def _check_password(password, encoded, submitted_at):
+    started_at = time()
+    valid = hashers.check_password(password, encoded)
+    # Django's own rule: the preferred hasher changed, or its parameters did
+    preferred = hashers.get_hasher()
+    must_update = valid and (
+        hashers.identify_hasher(encoded).algorithm != preferred.algorithm
+        or preferred.must_update(encoded)
+    )
+    return (valid, must_update), submitted_at, started_at, time()
+
+
+class HashingStats:
+    """Running totals of queue wait and hashing time per operation"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+        self.rejected = 0
+
+    def record(self, operation, queue_wait, hash_time):
+        with self._lock:
+            totals = self._totals.setdefault(
+                operation,
+                {"count": 0, "queue_wait": 0.0, "hash_time": 0.0, "max_wait": 0.0},
+            )
+            totals["count"] += 1
+            totals["queue_wait"] += queue_wait
+            totals["hash_time"] += hash_time
+            totals["max_wait"] = max(totals["max_wait"], queue_wait)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "operations": {
+                    operation: dict(totals)
+                    for operation, totals in self._totals.items()
+                },
+                "rejected": self.rejected,
+            }
+
+
+class HashingService:
+    """
+    Runs password hashing in a bounded pool of worker processes.
+
+    PBKDF2 holds the GIL for hundreds of milliseconds, so hashing in request
+    threads stalls every other request served by the same process. Here
+    ``PASSWORD_HASHING_WORKERS`` processes do the hashing, and at most
+    ``PASSWORD_HASHING_QUEUE_DEPTH`` more jobs may wait for a free worker;
+    beyond that callers get ``HashingUnavailable`` instead of piling up.
+    With zero workers hashing runs inline, exactly like Django does.
+    """
+
+    def __init__(self, workers=None, queue_depth=None, queue_timeout=None):
+        self.workers = (
+            workers
+            if workers is not None
+            else getattr(settings, "PASSWORD_HASHING_WORKERS", 0)
+        )
+        self.queue_depth = (
+            queue_depth
+            if queue_depth is not None
+            else getattr(settings, "PASSWORD_HASHING_QUEUE_DEPTH", 64)
+        )
+        self.queue_timeout = (
+            queue_timeout
+            if queue_timeout is not None
+            else getattr(settings, "PASSWORD_HASHING_QUEUE_TIMEOUT", 5.0)
+        )
+        self.stats = HashingStats()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def make_password(self, password):
+        return self._run("make_password", _make_password, password)
+
+    @phase("hash")
+    def make_passwords(self, passwords):
+        """
+        Hashes many passwords, spread evenly over the pool.
+
+        Each worker gets one slice of the list as a single job, so a large
+        batch takes ``workers`` queue slots rather than one per password.
+        """
+
+        passwords = list(passwords)
+
+        if not self.workers or len(passwords) < 2:
+            return [self.make_password(password) for password in passwords]
+
+        size = -(-len(passwords) // self.workers)
+        slices = [passwords[i : i + size] for i in range(0, len(passwords), size)]
+        acquired = 0
+
+        try:
+            for _slice in slices:
+                if not self._slots.acquire(timeout=self.queue_timeout):
+                    self.stats.reject()
+                    raise HashingUnavailable()
+                acquired += 1
+
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_make_passwords, chunk, time()) for chunk in slices
+            ]
+
+            return [
+                encoded
+                for future in futures
+                for encoded in self._record("make_passwords", future.result())
+            ]
+        except BrokenProcessPool:
+            self.shutdown()
+            raise HashingUnavailable()
+        finally:
+            for _slot in range(acquired):
+                self._slots.release()
+
+    def check_password(self, password, encoded):
+        """Returns ``(valid, must_update)`` for a password and its hash"""
+
+        return self._run("check_password", _check_password, password, encoded)
+
+    async def amake_password(self, password):
+        return await self._arun("make_password", _make_password, password)
+
+    async def acheck_password(self, password, encoded):
+        return await self._arun("check_password", _check_password, password, encoded)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            # A pool inherited through fork() belongs to the parent process
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", ""),),
+                )
+                self._pid = os.getpid()
+
+            return self._executor
+
+    def _record(self, operation, outcome):
+        result, submitted_at, started_at, finished_at = outcome
+        self.stats.record(
+            operation, started_at - submitted_at, finished_at - started_at
+        )
+        return result
+
+    @phase("hash")
+    def _run(self, operation, function, *args):
+        if not self.workers:
+            return self._record(operation, function(*args, time()))
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.stats.reject()
+            raise HashingUnavailable()
+
+        try:
+            future = self._get_executor().submit(function, *args, time())
+            return self._record(operation, future.result())
+        except BrokenProcessPool:
+            self.shutdown()
+            raise HashingUnavailable()
+        finally:
+            self._slots.release()
+
+    async def _arun(self, operation, function, *args):
+        with phase("hash"):
+            return await self._arun_timed(operation, function, *args)
+
+    async def _arun_timed(self, operation, function, *args):
+        if not self.workers:
+            # Inline hashing would hold the event loop for the whole hash
+            outcome = await sync_to_async(function, thread_sensitive=False)(
+                *args, time()
+            )
+            return self._record(operation, outcome)
+
+        # Waiting on the semaphore would block the event loop, a full queue
+        # is reported right away instead.
+        if not self._slots.acquire(blocking=False):
+            self.stats.reject()
+            raise HashingUnavailable()
+
+        try:
+            future = self._get_executor().submit(function, *args, time())
+            return self._record(operation, await asyncio.wrap_future(future))
+        except BrokenProcessPool:
+            self.shutdown()
+            raise HashingUnavailable()
+        finally:
+            self._slots.release()
+
+
+service = HashingService()
+
+
+def make_password(password):
+    return service.make_password(password)
+
+
+async def amake_password(password):
+    return await service.amake_password(password)
+
+
+def make_passwords(passwords):
+    return service.make_passwords(passwords)
+
+
+def set_password(user, raw_password):
+    """Pool-backed equivalent of ``user.set_password``"""
+
+    user.password = service.make_password(raw_password)
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    """
+    Pool-backed equivalent of ``user.check_password``.
+
+    Like Django, a hash made with outdated parameters is upgraded and saved
+    after a successful check.
+    """
+
+    valid, must_update = service.check_password(raw_password, user.password)
+
+    if must_update:
+        set_password(user, raw_password)
+        user._password = None
+        user.save(update_fields=["password"])
+
+    return valid
+
+
+async def acheck_password(user, raw_password):
+    valid, must_update = await service.acheck_password(raw_password, user.password)
+
+    if must_update:
+        user.password = await service.amake_password(raw_password)
+        await user.asave(update_fields=["password"])
+
+    return valid
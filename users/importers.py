@@ -0,0 +1,269 @@
+import binascii
+import csv
+import json
+import os
+import re
+from base64 import b64decode
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from . import hashing
+
+BOOLEAN_FIELDS = ("is_active", "is_verified", "is_staff")
+TRUTHY_VALUES = ("1", "true", "yes")
+
+# Passwords shaped like a hash this project cannot check: the "$id$..."
+# modular crypt format (bcrypt, argon2, sha512-crypt...) or the prefix of a
+# Django hasher missing from PASSWORD_HASHERS. Hashing them again as plain
+# text would lock their users out.
+FOREIGN_HASH = re.compile(
+    r"^(\$[a-z0-9-]+\$|(argon2|bcrypt|bcrypt_sha256|crypt|md5|pbkdf2_sha1"
+    r"|pbkdf2_sha256|scrypt|sha1|unsalted_md5|unsalted_sha1)\$)"
+)
+
+
+class RowError(Exception):
+    """Raised for a row that cannot be imported"""
+
+
+def is_well_formed(hasher, encoded):
+    """
+    Whether ``encoded`` is a complete hash in the format of ``hasher``.
+
+    The work factor must be positive, the salt present and the digest the
+    size the hasher produces, so a plain-text password that merely starts
+    like a hash is not taken for one.
+    """
+
+    try:
+        decoded = hasher.decode(encoded)
+    except (ValueError, TypeError):
+        return False
+
+    if decoded.get("iterations", 1) <= 0 or not decoded.get("salt"):
+        return False
+
+    digest = getattr(hasher, "digest", None)
+
+    if digest is None:
+        return bool(decoded.get("hash"))
+
+    try:
+        return len(b64decode(decoded["hash"], validate=True)) == digest().digest_size
+    except (binascii.Error, ValueError):
+        return False
+
+
+def _csv_records(handle):
+    """
+    Yields ``(record, end_offset)`` for every CSV record of a binary file.
+
+    Records are split on newlines that are not inside a quoted field, so the
+    byte offset after each record is exact and can be used to resume.
+    """
+
+    record = b""
+
+    for line in iter(handle.readline, b""):
+        record += line
+
+        if record.count(b'"') % 2:
+            continue
+
+        yield record, handle.tell()
+        record = b""
+
+    if record:
+        yield record, handle.tell()
+
+
+def read_rows(path, file_format, offset=0):
+    """
+    Streams rows of a CSV or JSONL file as ``(row, end_offset)``.
+
+    ``offset`` is a byte position previously returned as ``end_offset``,
+    reading starts right after the record it belongs to.
+    """
+
+    with open(path, "rb") as handle:
+        if file_format == "csv":
+            header = next(csv.reader([handle.readline().decode("utf-8-sig")]))
+
+            if offset:
+                handle.seek(offset)
+
+            for record, end_offset in _csv_records(handle):
+                text = record.decode("utf-8")
+                if not text.strip():
+                    continue
+
+                values = next(csv.reader(text.splitlines(keepends=True)))
+                yield dict(zip(header, values)), end_offset
+        else:
+            if offset:
+                handle.seek(offset)
+
+            for line in iter(handle.readline, b""):
+                end_offset = handle.tell()
+
+                if not line.strip():
+                    continue
+
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield RowError("Invalid JSON: %s" % error), end_offset
+                    continue
+
+                yield row, end_offset
+
+
+def clean_row(row):
+    """
+    Validates a row against the ``User`` model constraints.
+
+    Returns the model field values plus a ``hashed`` flag telling whether the
+    password is already a Django password hash. Passwords hashed with an
+    algorithm that is not enabled, or shaped like a hash of an enabled one
+    without being well formed, are rejected.
+    """
+
+    if isinstance(row, RowError):
+        raise row
+
+    if not isinstance(row, dict):
+        raise RowError("Row must be an object")
+
+    User = get_user_model()
+    values = {}
+
+    for name in ("email", "first_name", "last_name"):
+        value = str(row.get(name) or "").strip()
+        max_length = User._meta.get_field(name).max_length
+
+        if not value:
+            raise RowError("%s is required" % name)
+
+        if len(value) > max_length:
+            raise RowError("%s is longer than %d characters" % (name, max_length))
+
+        values[name] = value
+
+    try:
+        validate_email(values["email"])
+    except ValidationError:
+        raise RowError("email is not a valid email address")
+
+    values["email"] = User.objects.normalize_email(values["email"])
+
+    for name in BOOLEAN_FIELDS:
+        value = row.get(name)
+
+        if isinstance(value, str):
+            value = value.strip().lower() in TRUTHY_VALUES
+
+        values[name] = bool(value)
+
+    password = row.get("password") or None
+    hashed = False
+
+    if password is not None:
+        password = str(password)
+
+        try:
+            hasher = identify_hasher(password)
+        except ValueError:
+            hasher = None
+
+        if hasher is not None:
+            if not is_well_formed(hasher, password):
+                raise RowError(
+                    "password is not a well-formed %s hash" % hasher.algorithm
+                )
+
+            hashed = True
+        elif FOREIGN_HASH.match(password):
+            raise RowError("password is hashed with an unsupported algorithm")
+
+    values["password"] = password
+
+    return values, hashed
+
+
+class Checkpoint:
+    """Progress of an import, persisted next to the file being imported"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.offset = 0
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        # Size of the rejected rows file when the checkpoint was saved
+        self.errors_offset = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+
+        with open(self.path) as handle:
+            state = json.load(handle)
+
+        if state.get("source") != self.source:
+            raise ValueError(
+                "Checkpoint %s belongs to %s" % (self.path, state.get("source"))
+            )
+
+        self.offset = state["offset"]
+        self.imported = state["imported"]
+        self.skipped = state["skipped"]
+        self.failed = state["failed"]
+        self.errors_offset = state.get("errors_offset", 0)
+
+        return True
+
+    def save(self):
+        temporary = self.path + ".tmp"
+
+        with open(temporary, "w") as handle:
+            json.dump(
+                {
+                    "source": self.source,
+                    "offset": self.offset,
+                    "imported": self.imported,
+                    "skipped": self.skipped,
+                    "failed": self.failed,
+                    "errors_offset": self.errors_offset,
+                },
+                handle,
+            )
+            handle.flush()
+            os.fsync(handle.fileno())
+
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def build_users(rows, hasher=hashing.service):
+    """
+    Turns cleaned rows into unsaved ``User`` instances.
+
+    Plain-text passwords are hashed together through ``hasher``, rows without
+    a password get an unusable one.
+    """
+
+    User = get_user_model()
+    plain = [values for values, hashed in rows if not hashed]
+    encoded = hasher.make_passwords(values["password"] for values in plain)
+
+    for values, password in zip(plain, encoded):
+        values["password"] = password
+
+    return [User(**values) for values, _hashed in rows]
@@ -0,0 +1,137 @@
+from contextlib import ContextDecorator, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+# Timings of the request being served, set by the instrumentation middlewares
+_current = ContextVar("request_timings", default=None)
+
+
+class Timings:
+    """
+    Time spent in each phase of one request, and the queries it ran.
+
+    Phases are exclusive: entering a phase pauses the one it runs in, so a
+    query issued while serializing counts as ``db`` time only.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.queries = 0
+        self._stack = []
+        self._started = 0.0
+
+    def enter(self, name):
+        now = perf_counter()
+
+        if self._stack:
+            self._charge(self._stack[-1], now)
+
+        self._stack.append(name)
+        self._started = now
+
+    def exit(self):
+        now = perf_counter()
+        self._charge(self._stack.pop(), now)
+        self._started = now
+
+    def _charge(self, name, now):
+        self.phases[name] = self.phases.get(name, 0.0) + now - self._started
+
+
+def current():
+    """Returns the ``Timings`` of the request being served, if any"""
+
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """
+    Collects the timings of the block, queries included, and yields them.
+
+    Nested blocks share the timings of the outermost one, so several
+    middlewares can read the same request's timings. The timings follow
+    the context into the threads ``sync_to_async`` runs queries in.
+    """
+
+    timings = _current.get()
+
+    if timings is not None:
+        yield timings
+        return
+
+    timings = Timings()
+    token = _current.set(timings)
+
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+class phase(ContextDecorator):
+    """
+    Charges the time spent in a block to the phase ``name``.
+
+    Usable as a context manager or as a decorator of sync functions; async
+    code wraps its awaits in a ``with`` block. Outside of an instrumented
+    request it does nothing.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        timings = _current.get()
+
+        if timings is not None:
+            timings.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        timings = _current.get()
+
+        if timings is not None:
+            timings.exit()
+
+
+def instrument(connection):
+    """
+    Times the queries of ``connection`` for the request being served.
+
+    Connections are per thread, so the wrapper goes on each one as it is
+    created rather than around a request, whose async queries run on the
+    connections of another thread. It goes first, as the outermost
+    wrapper: ``execute_wrapper`` blocks pop the last one.
+    """
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing queries"""
+
+    timings = _current.get()
+
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    timings.queries += 1
+    timings.enter("db")
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.exit()
+
+
+class TimedSerializerMixin:
+    """Serializer mixin charging validation and rendering to ``serialize``"""
+
+    def run_validation(self, *args, **kwargs):
+        with phase("serialize"):
+            return super().run_validation(*args, **kwargs)
+
+    def to_representation(self, *args, **kwargs):
+        with phase("serialize"):
+            return super().to_representation(*args, **kwargs)
@@ -0,0 +1,129 @@
+from time import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import sharding
+
+# Stateless JSON Web Tokens, an alternative to the ``Token`` rows.
+#
+# Tokens are checked by signature and expiry, and carry the user details
+# ``VerifyTokenAPIView`` returns, so neither needs the database. Revocation
+# goes through a denylist in the cache named by ``JWT_DENYLIST_CACHE``:
+# single tokens by ``jti`` until they expire, and every token of a user
+# issued before a cutoff, set when their password changes. The denylist is
+# only as shared and as durable as that cache.
+
+DENIED_PREFIX = "users:jwt:denied:"
+CUTOFF_PREFIX = "users:jwt:cutoff:"
+
+# User details carried by the tokens
+USER_CLAIMS = ("email", "first_name", "last_name", "is_staff", "is_superuser")
+
+
+def _denylist():
+    return caches[getattr(settings, "JWT_DENYLIST_CACHE", "shared")]
+
+
+def looks_like_jwt(raw):
+    """Tells JWTs from ``Token`` keys, which have no dots"""
+
+    return raw.count(".") == 2
+
+
+def issue(user):
+    """Returns a new ``RefreshToken``, its ``access_token`` has the same claims"""
+
+    refresh = RefreshToken.for_user(user)
+
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+
+    refresh["date_joined"] = user.date_joined.isoformat()
+    refresh["date_updated"] = user.date_updated.isoformat()
+
+    return refresh
+
+
+def verify(raw):
+    """Returns the validated ``AccessToken`` for ``raw``, ``None`` if invalid"""
+
+    try:
+        token = AccessToken(raw)
+    except TokenError:
+        return None
+
+    return None if is_revoked(token) else token
+
+
+def is_revoked(token):
+    jti_key = DENIED_PREFIX + token[api_settings.JTI_CLAIM]
+    cutoff_key = CUTOFF_PREFIX + str(token[api_settings.USER_ID_CLAIM])
+    found = _denylist().get_many([jti_key, cutoff_key])
+
+    if jti_key in found:
+        return True
+
+    cutoff = found.get(cutoff_key)
+    return cutoff is not None and token["iat"] < cutoff
+
+
+def revoke(token):
+    """Denylists ``token`` until it expires"""
+
+    _denylist().set(
+        DENIED_PREFIX + token[api_settings.JTI_CLAIM],
+        True,
+        max(int(token["exp"] - time()), 1),
+    )
+
+
+def revoke_user(user):
+    """Revokes every token issued to ``user`` so far"""
+
+    _denylist().set(
+        CUTOFF_PREFIX + str(user.pk),
+        int(time()),
+        int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+async def arevoke_user(user):
+    """Async variant of ``revoke_user``"""
+
+    await _denylist().aset(
+        CUTOFF_PREFIX + str(user.pk),
+        int(time()),
+        int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+def refresh(raw):
+    """
+    Trades a refresh token for a new refresh token, which is returned.
+
+    The user is read again so the new tokens carry current details, and
+    the old refresh token is revoked. Raises ``TokenError`` when ``raw`` is
+    invalid, revoked, or its user is gone or inactive.
+    """
+
+    token = RefreshToken(raw)
+
+    if is_revoked(token):
+        raise TokenError(_("Token is revoked"))
+
+    user = sharding.first(
+        get_user_model().objects.filter(pk=token[api_settings.USER_ID_CLAIM])
+    )
+
+    if user is None or not user.is_active:
+        raise TokenError(_("User inactive or deleted."))
+
+    revoke(token)
+    return issue(user)
@@ -0,0 +1,126 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import PasswordResetTokenGenerator
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import (
+    base36_to_int,
+    urlsafe_base64_decode,
+    urlsafe_base64_encode,
+)
+
+from . import sharding
+
+
+class LinkTokenGenerator(PasswordResetTokenGenerator):
+    """
+    Signed, expiring tokens for the links mailed to users, one per purpose.
+
+    A token is an HMAC over the user id, the purpose and the ``state_fields``
+    of the user, so it is voided by any change to them; nothing is stored.
+    Links carry ``<uid>:<token>`` and are checked with one primary key read.
+    """
+
+    purpose = None
+    state_fields = ()
+    timeout_setting = None
+    default_timeout = 259200
+
+    def __init__(self):
+        super().__init__()
+        self.key_salt = "users.links.%s" % self.purpose
+
+    @property
+    def timeout(self):
+        return getattr(settings, self.timeout_setting, self.default_timeout)
+
+    def _make_hash_value(self, user, timestamp):
+        state = []
+
+        for field in self.state_fields:
+            value = getattr(user, field)
+
+            # Some databases drop microseconds
+            if isinstance(value, datetime):
+                value = value.replace(microsecond=0, tzinfo=None)
+
+            state.append("" if value is None else str(value))
+
+        return "%s|%s|%s|%s" % (user.pk, self.purpose, "|".join(state), timestamp)
+
+    def check_token(self, user, token):
+        if not (user and token):
+            return False
+
+        try:
+            timestamp = base36_to_int(token.split("-")[0])
+        except ValueError:
+            return False
+
+        for secret in [self.secret, *self.secret_fallbacks]:
+            if constant_time_compare(
+                self._make_token_with_timestamp(user, timestamp, secret), token
+            ):
+                break
+        else:
+            return False
+
+        return self._num_seconds(self._now()) - timestamp <= self.timeout
+
+    def make_link_token(self, user):
+        """Returns the ``<uid>:<token>`` string to put in a link for ``user``"""
+
+        return "%s:%s" % (
+            urlsafe_base64_encode(force_bytes(user.pk)),
+            self.make_token(user),
+        )
+
+    def _parse(self, link_token):
+        try:
+            uid, token = link_token.split(":", 1)
+            return int(force_str(urlsafe_base64_decode(uid))), token
+        except ValueError:
+            return None, None
+
+    def get_user(self, link_token):
+        """Returns the user a link was made for, ``None`` if it is not valid"""
+
+        pk, token = self._parse(link_token)
+        if pk is None:
+            return None
+
+        user = sharding.first(get_user_model().objects.filter(pk=pk))
+        return user if self.check_token(user, token) else None
+
+    async def aget_user(self, link_token):
+        """Async variant of ``get_user``"""
+
+        pk, token = self._parse(link_token)
+        if pk is None:
+            return None
+
+        user = await sharding.afirst(get_user_model().objects.filter(pk=pk))
+        return user if self.check_token(user, token) else None
+
+
+class EmailVerificationTokenGenerator(LinkTokenGenerator):
+    """Email verification links, voided when the email changes"""
+
+    purpose = "verify-email"
+    state_fields = ("email",)
+    timeout_setting = "EMAIL_VERIFICATION_TIMEOUT"
+
+
+class PasswordResetLinkTokenGenerator(LinkTokenGenerator):
+    """Password reset links, voided once the password is changed"""
+
+    purpose = "reset-password"
+    state_fields = ("email", "password", "last_login")
+    timeout_setting = "PASSWORD_RESET_TIMEOUT"
+    default_timeout = 3600
+
+
+email_verification = EmailVerificationTokenGenerator()
+password_reset = PasswordResetLinkTokenGenerator()
@@ -0,0 +1,65 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from users import exporters
+
+
+class Command(BaseCommand):
+    help = "Streams every user as NDJSON or CSV to a file or stdout"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            dest="export_format",
+            choices=sorted(exporters.CONTENT_TYPES),
+            default="ndjson",
+            help="Output format (default: ndjson)",
+        )
+        parser.add_argument(
+            "--output",
+            "-o",
+            default="-",
+            help="File to write to, '-' for stdout (default: -)",
+        )
+        parser.add_argument(
+            "--gzip",
+            action="store_true",
+            help="Gzip-compress the output",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=None,
+            help="Rows fetched from the database per round-trip",
+        )
+
+    def handle(self, *args, **options):
+        blocks = exporters.export_users(
+            export_format=options["export_format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+
+        if options["output"] == "-":
+            self.write_blocks(blocks, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options["output"], "wb") as output:
+            written = self.write_blocks(blocks, output)
+
+        self.stderr.write(
+            self.style.SUCCESS(
+                "Exported users to %s (%d bytes)" % (options["output"], written)
+            )
+        )
+
+    def write_blocks(self, blocks, output):
+        written = 0
+
+        for block in blocks:
+            output.write(block)
+            written += len(block)
+
+        return written
@@ -0,0 +1,225 @@
+import json
+import os
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users import hashing, importers, search, sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports users from a CSV or JSONL file in batches, checkpointing "
+        "progress so an interrupted import can be resumed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file to import")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=("csv", "jsonl"),
+            default=None,
+            help="File format (default: guessed from the file extension)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows inserted per bulk_create (default: 1000)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Processes hashing plain-text passwords "
+            "(default: PASSWORD_HASHING_WORKERS)",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Checkpoint file (default: <path>.checkpoint)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an existing checkpoint and import from the beginning",
+        )
+        parser.add_argument(
+            "--errors",
+            default=None,
+            help="Write rejected rows to this JSONL file, which must be new "
+            "or empty unless resuming",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"] or (
+            "csv" if path.lower().endswith(".csv") else "jsonl"
+        )
+        batch_size = options["batch_size"]
+
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        checkpoint = importers.Checkpoint(
+            options["checkpoint"] or path + ".checkpoint", path
+        )
+
+        resuming = False
+
+        if options["restart"]:
+            checkpoint.clear()
+        elif checkpoint.load():
+            resuming = True
+            self.stderr.write(
+                "Resuming at byte %d (%d imported so far)"
+                % (checkpoint.offset, checkpoint.imported)
+            )
+
+        if (
+            options["errors"]
+            and not resuming
+            and os.path.exists(options["errors"])
+            and os.path.getsize(options["errors"])
+        ):
+            raise CommandError(
+                "%s already holds rejected rows, remove it or pick another "
+                "--errors file" % options["errors"]
+            )
+
+        if options["workers"] is not None:
+            self.hasher = hashing.HashingService(workers=options["workers"])
+        else:
+            self.hasher = hashing.service
+
+        self.errors = None
+
+        if options["errors"]:
+            self.errors = open(options["errors"], "a")
+
+            if resuming:
+                # Rows rejected after the checkpoint are rejected again
+                self.errors.truncate(checkpoint.errors_offset)
+                self.errors.seek(0, os.SEEK_END)
+
+        self.started = perf_counter()
+        self.processed = 0
+
+        try:
+            self.run(path, file_format, batch_size, checkpoint)
+        finally:
+            if self.errors:
+                self.errors.close()
+            if self.hasher is not hashing.service:
+                self.hasher.shutdown()
+
+        checkpoint.clear()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported %d users, skipped %d existing, rejected %d rows (%.0f rows/s)"
+                % (
+                    checkpoint.imported,
+                    checkpoint.skipped,
+                    checkpoint.failed,
+                    self.rate(),
+                )
+            )
+        )
+
+    def run(self, path, file_format, batch_size, checkpoint):
+        batch = []
+        offset = checkpoint.offset
+
+        for row, offset in importers.read_rows(path, file_format, checkpoint.offset):
+            self.processed += 1
+
+            try:
+                batch.append(importers.clean_row(row))
+            except importers.RowError as error:
+                checkpoint.failed += 1
+                self.reject(row, error)
+
+            if len(batch) >= batch_size:
+                self.flush(batch, checkpoint, offset)
+                batch = []
+
+        self.flush(batch, checkpoint, offset)
+
+    def flush(self, batch, checkpoint, offset):
+        User = get_user_model()
+        unique = {}
+
+        for values, hashed in batch:
+            if values["email"] in unique:
+                checkpoint.skipped += 1
+            else:
+                unique[values["email"]] = (values, hashed)
+
+        existing = sharding.existing_emails(list(unique))
+        rows = [row for email, row in unique.items() if email not in existing]
+        users = importers.build_users(rows, hasher=self.hasher)
+        sharding.assign_ids(users)
+        shards = sharding.group_by_shard(users)
+
+        inserted = 0
+
+        # The batch and the checkpoint after it move forward together, and
+        # ignore_conflicts keeps a replayed batch harmless should the process
+        # die between the commit and the checkpoint write.
+        with sharding.atomic([None, *shards]):
+            for alias, shard_users in shards.items():
+                emails = [user.email for user in shard_users]
+
+                # Rows inserted since the existing_emails() check above are
+                # dropped by ignore_conflicts, they must not count as imported
+                taken = set(
+                    User.objects.using(alias)
+                    .filter(email__in=emails)
+                    .values_list("email", flat=True)
+                )
+
+                User.objects.using(alias).bulk_create(
+                    shard_users, ignore_conflicts=True
+                )
+
+                new = [email for email in emails if email not in taken]
+                inserted += len(new)
+
+                # ignore_conflicts leaves primary keys unset, the search index
+                # needs them.
+                search.get_backend().index(
+                    User.objects.using(alias)
+                    .filter(email__in=new)
+                    .only(*search.INDEXED_FIELDS)
+                )
+
+        checkpoint.imported += inserted
+        checkpoint.skipped += len(existing) + len(users) - inserted
+        checkpoint.offset = offset
+
+        if self.errors:
+            self.errors.flush()
+            checkpoint.errors_offset = self.errors.tell()
+
+        checkpoint.save()
+
+        self.stderr.write(
+            "%d imported, %d skipped, %d rejected (%.0f rows/s)"
+            % (checkpoint.imported, checkpoint.skipped, checkpoint.failed, self.rate())
+        )
+
+    def reject(self, row, error):
+        if self.errors is None:
+            return
+
+        if isinstance(row, importers.RowError):
+            row = None
+
+        self.errors.write(json.dumps({"error": str(error), "row": row}) + "\n")
+
+    def rate(self):
+        elapsed = perf_counter() - self.started
+        return self.processed / elapsed if elapsed else 0.0
@@ -0,0 +1,63 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from users import outbox
+
+
+class Command(BaseCommand):
+    help = "Delivers queued emails from the outbox with a pool of worker threads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of delivery threads (default: OUTBOX_WORKERS)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Messages claimed per batch (default: OUTBOX_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds to sleep when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Deliver everything that is currently due and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            total = 0
+
+            while True:
+                handled = outbox.drain(options["batch_size"])
+                if not handled:
+                    break
+                total += handled
+
+            self.stdout.write(self.style.SUCCESS("Handled %d message(s)" % total))
+            return
+
+        worker = outbox.OutboxWorker(
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+        )
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping outbox worker...")
+            worker.stop()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        self.stdout.write("Outbox worker started with %d thread(s)" % worker.workers)
+        worker.run()
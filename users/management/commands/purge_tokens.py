@@ -0,0 +1,73 @@
+from time import perf_counter, sleep
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the authentication tokens unused for longer than TOKEN_TTL, "
+        "in small batches; run it periodically, e.g. from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Tokens deleted per transaction (default: 1000)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to wait between batches, leaving room for writers",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=None,
+            help="Keep running, purging every this many seconds",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        if tokens.ttl() is None:
+            raise CommandError("Tokens never expire, set TOKEN_TTL")
+
+        while True:
+            self.purge(options)
+
+            if options["every"] is None:
+                return
+
+            sleep(options["every"])
+
+    def purge(self, options):
+        started = perf_counter()
+        total = 0
+
+        for alias in tokens.databases():
+            removed = 0
+            batches = 0
+
+            for deleted in tokens.purge_expired(alias, options["batch_size"]):
+                removed += deleted
+                batches += 1
+
+                if options["pause"]:
+                    sleep(options["pause"])
+
+            self.stderr.write(
+                "%s: removed %d tokens in %d batches" % (alias, removed, batches)
+            )
+            total += removed
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Removed %d expired tokens in %.1fs" % (total, perf_counter() - started)
+            )
+        )
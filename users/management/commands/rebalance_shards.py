@@ -0,0 +1,90 @@
+from collections import Counter
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves users and their tokens to the shard their email maps to, "
+        "after shards were added or when sharding an existing database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Users examined per batch (default: 500)",
+        )
+        parser.add_argument(
+            "--include-default",
+            action="store_true",
+            help="Also move users stored on the default database",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many users would move where",
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError("Sharding is disabled, set DATABASE_SHARDS")
+
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        sources = list(sharding.shards())
+        if options["include_default"]:
+            sources.insert(0, sharding.PRIMARY)
+
+        started = perf_counter()
+        moves = Counter()
+
+        for source in sources:
+            examined = self.rebalance(source, options, moves)
+            self.stderr.write("%s: examined %d users" % (source, examined))
+
+        for (source, target), count in sorted(moves.items()):
+            self.stdout.write("%s -> %s: %d" % (source, target, count))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "%s %d users in %.1fs"
+                % (
+                    "Would move" if options["dry_run"] else "Moved",
+                    sum(moves.values()),
+                    perf_counter() - started,
+                )
+            )
+        )
+
+    def rebalance(self, source, options, moves):
+        User = get_user_model()
+        last_pk = 0
+        examined = 0
+
+        while True:
+            batch = list(
+                User.objects.using(source)
+                .filter(pk__gt=last_pk)
+                .order_by("pk")[: options["batch_size"]]
+            )
+
+            if not batch:
+                return examined
+
+            last_pk = batch[-1].pk
+            examined += len(batch)
+
+            for user in batch:
+                target = sharding.shard_for_email(user.email)
+                if target != source:
+                    moves[source, target] += 1
+
+            if not options["dry_run"]:
+                sharding.relocate(batch, source)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from users import search
+
+
+class Command(BaseCommand):
+    help = "Recreates the users search index from the user table"
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        backend.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS("Rebuilt search index (%s)" % type(backend).__name__)
+        )
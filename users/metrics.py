@@ -0,0 +1,293 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import uuid
+from time import monotonic
+
+from django.conf import settings
+
+from . import hashing, profiles
+
+# Request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+FAMILIES = {
+    "users_http_requests_total": ("counter", "Requests served, per view"),
+    "users_http_request_duration_seconds": (
+        "histogram",
+        "Request latency, per view",
+    ),
+    "users_db_queries_total": ("counter", "Database queries run, per view"),
+    "users_phase_seconds_total": (
+        "counter",
+        "Time spent per phase of the requests to a view",
+    ),
+    "users_hashing_operations_total": ("counter", "Password hashing operations"),
+    "users_hashing_queue_wait_seconds_total": (
+        "counter",
+        "Time hashing operations waited for a free worker",
+    ),
+    "users_hashing_seconds_total": ("counter", "Time spent hashing passwords"),
+    "users_hashing_rejected_total": (
+        "counter",
+        "Hashing operations rejected because the queue was full",
+    ),
+    "users_profile_cache_requests_total": (
+        "counter",
+        "User profile cache lookups, per result",
+    ),
+    "users_profile_cache_loads_total": (
+        "counter",
+        "User profiles loaded from the database into the cache",
+    ),
+    "users_profile_cache_waits_total": (
+        "counter",
+        "Lookups that waited for a concurrent load of the same profile",
+    ),
+    "users_profile_cache_entries": ("gauge", "User profiles held in the cache"),
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Registry:
+    """
+    In-process metric counters, exported in the Prometheus text format.
+
+    Every series is a float keyed by metric name and label values; updates
+    only take a lock and bump a few dict entries. With ``METRICS_DIR`` set,
+    each process also writes its counters to its own file there, at most
+    every ``METRICS_FLUSH_INTERVAL`` seconds, and ``render`` adds up the
+    files of every process so any worker can answer a scrape.
+    """
+
+    def __init__(self, directory=None, flush_interval=None):
+        self.directory = (
+            directory if directory is not None else _setting("METRICS_DIR", None)
+        )
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else _setting("METRICS_FLUSH_INTERVAL", 5.0)
+        )
+        self._series = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._flushed_at = monotonic()
+        self._path = None
+        self._pid = None
+
+    def observe(self, view, method, status, seconds, timings):
+        """Records one request and the phase timings it collected"""
+
+        with self._lock:
+            self._add("users_http_requests_total", (view, method, str(status)), 1)
+
+            for bound in LATENCY_BUCKETS:
+                if seconds <= bound:
+                    self._add(
+                        "users_http_request_duration_seconds_bucket",
+                        (view, repr(bound)),
+                        1,
+                    )
+            self._add("users_http_request_duration_seconds_bucket", (view, "+Inf"), 1)
+            self._add("users_http_request_duration_seconds_sum", (view,), seconds)
+            self._add("users_http_request_duration_seconds_count", (view,), 1)
+
+            self._add("users_db_queries_total", (view,), timings.queries)
+
+            for name, spent in timings.phases.items():
+                self._add("users_phase_seconds_total", (view, name), spent)
+
+        self.maybe_flush()
+
+    def _add(self, name, labels, value):
+        key = (name, labels)
+        self._series[key] = self._series.get(key, 0.0) + value
+
+    def register(self, collector):
+        """
+        Adds ``collector``, a function returning ``{(name, labels): value}``
+        read from counters kept elsewhere, to every snapshot.
+        """
+
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        with self._lock:
+            series = dict(self._series)
+
+        for collector in self._collectors:
+            for key, value in collector().items():
+                series[key] = series.get(key, 0.0) + value
+
+        return series
+
+    def maybe_flush(self):
+        if self.directory and monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Writes this process' counters to its file in ``METRICS_DIR``"""
+
+        if not self.directory:
+            return
+
+        self._flushed_at = monotonic()
+        rows = [
+            [name, list(labels), value]
+            for (name, labels), value in self.snapshot().items()
+        ]
+
+        os.makedirs(self.directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        # Written aside and renamed, readers never see half a file
+        with os.fdopen(handle, "w") as output:
+            json.dump(rows, output)
+        os.replace(temporary, self.own_path())
+
+    def own_path(self):
+        # A fresh name per process, a recycled pid must not overwrite the
+        # counters a dead process left behind
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(
+                self.directory, "%d-%s.json" % (self._pid, uuid.uuid4().hex[:8])
+            )
+
+        return self._path
+
+    def collect(self):
+        """Counters of every process, this one included"""
+
+        series = self.snapshot()
+
+        if not self.directory or not os.path.isdir(self.directory):
+            return series
+
+        own = os.path.basename(self.own_path())
+
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json") or filename == own:
+                continue
+
+            try:
+                with open(os.path.join(self.directory, filename)) as handle:
+                    rows = json.load(handle)
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, value in rows:
+                key = (name, tuple(labels))
+                series[key] = series.get(key, 0.0) + value
+
+        return series
+
+    def render(self):
+        """Returns all counters in the Prometheus text exposition format"""
+
+        series = self.collect()
+        lines = []
+
+        for family, (kind, description) in FAMILIES.items():
+            lines.append("# HELP %s %s" % (family, description))
+            lines.append("# TYPE %s %s" % (family, kind))
+
+            for (name, labels), value in sorted(series.items(), key=sort_key):
+                if name == family or (
+                    kind == "histogram" and name.startswith(family + "_")
+                ):
+                    lines.append(
+                        "%s%s %s"
+                        % (name, format_labels(name, labels), format_value(value))
+                    )
+
+        return "\n".join(lines) + "\n"
+
+
+LABELS = {
+    "users_http_requests_total": ("view", "method", "status"),
+    "users_http_request_duration_seconds_bucket": ("view", "le"),
+    "users_http_request_duration_seconds_sum": ("view",),
+    "users_http_request_duration_seconds_count": ("view",),
+    "users_db_queries_total": ("view",),
+    "users_phase_seconds_total": ("view", "phase"),
+    "users_hashing_operations_total": ("operation",),
+    "users_hashing_queue_wait_seconds_total": ("operation",),
+    "users_hashing_seconds_total": ("operation",),
+    "users_hashing_rejected_total": (),
+    "users_profile_cache_requests_total": ("result",),
+    "users_profile_cache_loads_total": (),
+    "users_profile_cache_waits_total": (),
+    "users_profile_cache_entries": (),
+}
+
+
+def sort_key(item):
+    (name, labels), value = item
+
+    # Buckets in increasing order, "+Inf" last
+    if name.endswith("_bucket"):
+        return name, labels[:-1], float(labels[-1])
+
+    return name, labels, 0.0
+
+
+def format_labels(name, values):
+    if not values:
+        return ""
+
+    return "{%s}" % ",".join(
+        '%s="%s"' % (label, escape(value)) for label, value in zip(LABELS[name], values)
+    )
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    return repr(int(value)) if value == int(value) else repr(value)
+
+
+def hashing_series():
+    """Queue wait and hashing time of the password hashing pool"""
+
+    stats = hashing.service.stats.snapshot()
+    series = {("users_hashing_rejected_total", ()): stats["rejected"]}
+
+    for operation, totals in stats["operations"].items():
+        series["users_hashing_operations_total", (operation,)] = totals["count"]
+        series["users_hashing_queue_wait_seconds_total", (operation,)] = totals[
+            "queue_wait"
+        ]
+        series["users_hashing_seconds_total", (operation,)] = totals["hash_time"]
+
+    return series
+
+
+def profile_cache_series():
+    """Hits, misses and size of the user profile cache"""
+
+    stats = profiles.cache.stats()
+
+    return {
+        ("users_profile_cache_requests_total", ("hit",)): stats["hits"],
+        ("users_profile_cache_requests_total", ("miss",)): stats["misses"],
+        ("users_profile_cache_loads_total", ()): stats["loads"],
+        ("users_profile_cache_waits_total", ()): stats["waits"],
+        ("users_profile_cache_entries", ()): stats["size"],
+    }
+
+
+registry = Registry()
+registry.register(hashing_series)
+registry.register(profile_cache_series)
+
+# Counters recorded since the last periodic flush are written on the way out
+atexit.register(registry.flush)
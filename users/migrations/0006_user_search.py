@@ -0,0 +1,58 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:42
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS users_user_fts "
+        "USING fts5(email, first_name, last_name)"
+    )
+    schema_editor.execute(
+        "INSERT INTO users_user_fts (rowid, email, first_name, last_name) "
+        "SELECT id, email, first_name, last_name FROM users_user"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute("DROP TABLE IF EXISTS users_user_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0005_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email"),
+                name="users_user_email_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.text.Lower("first_name"),
+                name="users_user_first_lower_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.text.Lower("last_name"),
+                name="users_user_last_lower_idx",
+            ),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
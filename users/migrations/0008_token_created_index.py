@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+# The token model belongs to DRF, its expiry index is added from here so
+# purge_tokens finds expired tokens without scanning the table
+INDEX = models.Index(fields=["created"], name="users_token_created_idx")
+
+
+def create_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model("authtoken", "Token"), INDEX)
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model("authtoken", "Token"), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authtoken", "0004_alter_tokenproxy_options"),
+        ("users", "0007_idsequence"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
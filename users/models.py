@@ -4,11 +4,32 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from . import hashing, sharding
 
 # Create your models here
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    """
+    Sends lookups by email to the user's shard when sharding is enabled.
+
+    Other queries are left to the database routers; the views fan those out
+    to every shard with the helpers in ``users.sharding``.
+    """
+
+    def _filter_or_exclude(self, negate, args, kwargs):
+        clone = super()._filter_or_exclude(negate, args, kwargs)
+
+        if not negate and self._db is None and "email" in kwargs:
+            clone._db = sharding.shard_for_email(kwargs["email"])
+
+        return clone
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """
     Object Manager for User model.
 
@@ -31,7 +52,7 @@ class UserManager(BaseUserManager):
             **extra_fields
         )
 
-        user.set_password(password)
+        hashing.set_password(user, password)
 
         user.save(using=self._db)
 
@@ -69,5 +90,73 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    class Meta:
+        indexes = [
+            # Keyset pagination over (date_joined, id), optionally narrowed
+            # down by the status flags the user list can be filtered on.
+            models.Index(fields=["date_joined", "id"], name="users_user_joined_idx"),
+            models.Index(
+                fields=["is_active", "date_joined", "id"],
+                name="users_user_active_joined_idx",
+            ),
+            models.Index(
+                fields=["is_verified", "date_joined", "id"],
+                name="users_user_verified_joined_idx",
+            ),
+            # Case-insensitive prefix search
+            models.Index(Lower("email"), name="users_user_email_lower_idx"),
+            models.Index(Lower("first_name"), name="users_user_first_lower_idx"),
+            models.Index(Lower("last_name"), name="users_user_last_lower_idx"),
+        ]
+
     def __str__(self) -> str:
         return self.email
+
+
+class OutboxMessage(models.Model):
+    """Email waiting to be delivered by the outbox worker"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        SENDING = "sending", "Sending"
+        SENT = "sent", "Sent"
+        FAILED = "failed", "Failed"
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    to = models.JSONField()
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a pending message becomes due, or when the lease of a message
+    # being sent runs out and it may be picked up again.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="users_outbox_due_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return "%s -> %s" % (self.subject, ", ".join(self.to))
+
+
+class IdSequence(models.Model):
+    """
+    Counter handing out primary keys, kept on the default database.
+
+    Sharded users take their ids from here so they stay unique across
+    shards and can move between shards unchanged.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return "%s: %d" % (self.name, self.value)
@@ -0,0 +1,238 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .instrumentation import phase
+from .models import OutboxMessage
+from .utils import Mail
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+@phase("mail")
+def enqueue(data):
+    """
+    Stores an email in the outbox instead of sending it right away.
+
+    ``data`` has the same shape ``utils.Mail.send_mail`` takes.
+    """
+
+    return OutboxMessage.objects.create(
+        subject=data["email_subject"], body=data["email_body"], to=data["to_email"]
+    )
+
+
+async def aenqueue(data):
+    """Async variant of ``enqueue``"""
+
+    with phase("mail"):
+        return await OutboxMessage.objects.acreate(
+            subject=data["email_subject"], body=data["email_body"], to=data["to_email"]
+        )
+
+
+@phase("mail")
+def enqueue_many(messages):
+    """Stores many emails in the outbox with batched inserts"""
+
+    return OutboxMessage.objects.bulk_create(
+        [
+            OutboxMessage(
+                subject=data["email_subject"],
+                body=data["email_body"],
+                to=data["to_email"],
+            )
+            for data in messages
+        ],
+        batch_size=getattr(settings, "OUTBOX_INSERT_BATCH_SIZE", 500),
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff before the next delivery attempt"""
+
+    base = _setting("OUTBOX_RETRY_BACKOFF", 30)
+    ceiling = _setting("OUTBOX_MAX_BACKOFF", 3600)
+
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), ceiling))
+
+
+def claim(batch_size):
+    """
+    Leases up to ``batch_size`` due messages to the calling worker.
+
+    Each message is claimed with a conditional UPDATE, so concurrent workers
+    never deliver the same message twice. Claiming counts as an attempt:
+    messages whose lease ran out because their worker died are due again
+    and get picked up here as well, unless they used up their attempts, in
+    which case they are marked failed. A message that kills its worker
+    every time is not retried forever.
+    """
+
+    now = timezone.now()
+    lease = timedelta(seconds=_setting("OUTBOX_LEASE", 300))
+    max_attempts = _setting("OUTBOX_MAX_ATTEMPTS", 5)
+
+    candidates = (
+        OutboxMessage.objects.filter(
+            Q(status=OutboxMessage.Status.PENDING)
+            | Q(status=OutboxMessage.Status.SENDING),
+            next_attempt_at__lte=now,
+        )
+        .order_by("next_attempt_at")
+        .values_list("pk", "status", "next_attempt_at", "attempts")[:batch_size]
+    )
+
+    claimed = []
+
+    for pk, current_status, due_at, attempts in candidates:
+        unchanged = OutboxMessage.objects.filter(
+            pk=pk, status=current_status, next_attempt_at=due_at
+        )
+
+        if current_status == OutboxMessage.Status.SENDING and attempts >= max_attempts:
+            if unchanged.update(
+                status=OutboxMessage.Status.FAILED,
+                last_error="Lease expired on the last attempt",
+            ):
+                logger.error(
+                    "Giving up on outbox message %s: lease expired %s times",
+                    pk,
+                    attempts,
+                )
+            continue
+
+        updated = unchanged.update(
+            status=OutboxMessage.Status.SENDING,
+            next_attempt_at=now + lease,
+            attempts=F("attempts") + 1,
+        )
+
+        if updated:
+            claimed.append(pk)
+
+    return list(OutboxMessage.objects.filter(pk__in=claimed).order_by("pk"))
+
+
+def mark_sent(messages):
+    OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+        status=OutboxMessage.Status.SENT, sent_at=timezone.now(), last_error=""
+    )
+
+
+def mark_failed(message, error):
+    # ``claim`` counted the attempt already
+    message.last_error = repr(error)
+
+    if message.attempts >= _setting("OUTBOX_MAX_ATTEMPTS", 5):
+        message.status = OutboxMessage.Status.FAILED
+        logger.error("Giving up on outbox message %s: %r", message.pk, error)
+    else:
+        message.status = OutboxMessage.Status.PENDING
+        message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+        logger.warning(
+            "Outbox message %s failed (attempt %s): %r",
+            message.pk,
+            message.attempts,
+            error,
+        )
+
+    message.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+
+def deliver(messages):
+    """Sends a batch of claimed messages, recording the outcome of each"""
+
+    report = Mail.send_messages(
+        [
+            Mail.build_message(
+                {
+                    "email_subject": message.subject,
+                    "email_body": message.body,
+                    "to_email": message.to,
+                }
+            )
+            for message in messages
+        ]
+    )
+
+    mark_sent(
+        [message for message, error in zip(messages, report.outcomes) if error is None]
+    )
+
+    for message, error in zip(messages, report.outcomes):
+        if error is not None:
+            mark_failed(message, error)
+
+    return report
+
+
+def drain(batch_size=None):
+    """
+    Delivers one batch of due messages.
+
+    Returns how many messages were handled, failed attempts included, so
+    callers know whether the outbox had anything due.
+    """
+
+    if batch_size is None:
+        batch_size = _setting("OUTBOX_BATCH_SIZE", 50)
+
+    messages = claim(batch_size)
+
+    if messages:
+        deliver(messages)
+
+    return len(messages)
+
+
+class OutboxWorker:
+    """
+    Pool of threads draining the outbox until stopped.
+
+    Every thread claims its own batches, so the pool can be scaled up
+    without coordination and several worker processes can run side by side.
+    """
+
+    def __init__(self, workers=None, batch_size=None, poll_interval=None):
+        self.workers = workers or _setting("OUTBOX_WORKERS", 4)
+        self.batch_size = batch_size or _setting("OUTBOX_BATCH_SIZE", 50)
+        self.poll_interval = poll_interval or _setting("OUTBOX_POLL_INTERVAL", 1.0)
+        self.stopped = threading.Event()
+
+    def run(self):
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="outbox"
+        ) as executor:
+            for _ in range(self.workers):
+                executor.submit(self.loop)
+
+    def loop(self):
+        try:
+            while not self.stopped.is_set():
+                close_old_connections()
+
+                try:
+                    handled = drain(self.batch_size)
+                except Exception:
+                    logger.exception("Outbox worker failed to drain a batch")
+                    handled = 0
+
+                if not handled:
+                    self.stopped.wait(self.poll_interval)
+        finally:
+            Mail.close()
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
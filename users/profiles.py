@@ -0,0 +1,239 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from . import exporters, sharding
+from .caching import ReadThroughCache
+
+# Every save of a user stamps its date_updated, as the payloads format it,
+# in the shared cache named by USER_CACHE_ALIAS; a cached payload of another
+# date is stale. A stamp outlives USER_CACHE_TTL, so every payload older
+# than it expires first. Only a stamp evicted early by the shared cache, or
+# a write bypassing the model signals, leaves copies stale for USER_CACHE_TTL.
+VERSION_PREFIX = "users:profile:version:"
+# Stamp of deleted users, matches no payload
+DELETED = ""
+
+
+def _shared():
+    alias = getattr(settings, "USER_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def _version_keys(entries):
+    return [VERSION_PREFIX + str(pk) for pk, _payload in entries]
+
+
+def _current(entries, stamps):
+    # Without a stamp, nothing changed the user for longer than the TTL
+    return [
+        stamps.get(key, payload["date_updated"]) == payload["date_updated"]
+        for key, (_pk, payload) in zip(_version_keys(entries), entries)
+    ]
+
+
+def _is_current(entries):
+    shared = _shared()
+
+    if shared is None:
+        return [True] * len(entries)
+
+    return _current(entries, shared.get_many(_version_keys(entries)))
+
+
+async def _ais_current(entries):
+    shared = _shared()
+
+    if shared is None:
+        return [True] * len(entries)
+
+    return _current(entries, await shared.aget_many(_version_keys(entries)))
+
+
+cache = ReadThroughCache(
+    max_size=getattr(settings, "USER_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "USER_CACHE_TTL", 60),
+    is_current=_is_current,
+    ais_current=_ais_current,
+)
+
+
+def _values(fields=None, using=None, **lookup):
+    from .serializers import UserValuesSerializer
+
+    return UserValuesSerializer.values(
+        get_user_model().objects.using(using).filter(**lookup), fields
+    )
+
+
+def _entry(row):
+    from .serializers import UserValuesSerializer
+
+    return (row["id"], UserValuesSerializer(row).data), (
+        ("email", row["email"]),
+        ("id", row["id"]),
+    )
+
+
+def _load(**lookup):
+    row = sharding.first(_values(**lookup))
+    return None if row is None else _entry(row)
+
+
+def _subset(payload, fields):
+    return {name: payload[name] for name in fields}
+
+
+def _serialize(row, fields):
+    from .serializers import UserValuesSerializer
+
+    return UserValuesSerializer(row, fields=fields).data
+
+
+def _drop_older(key, date_updated):
+    """Drops the payload cached under ``key`` unless it is at ``date_updated``"""
+
+    entry = cache.entries.get(key)
+
+    if entry is not None and entry[1]["date_updated"] != exporters.datetime_formatter()(
+        date_updated
+    ):
+        cache.invalidate_where(lambda cached: cached[0] == entry[0])
+
+
+def get_by_email(email, fields=None, date_updated=None):
+    """
+    Returns the serialized user with the given email, or ``None``.
+
+    With ``fields``, only those are returned: sliced from the cached payload
+    when there is one, otherwise read with just their columns and not cached.
+    ``date_updated``, when the caller read it from the database, replaces a
+    cached payload of another version.
+    """
+
+    if date_updated is not None:
+        _drop_older(("email", email), date_updated)
+
+    if fields is not None:
+        entry = cache.get(("email", email))
+
+        if entry is not None:
+            return _subset(entry[1], fields)
+
+        row = sharding.first(_values(fields, email=email))
+        return row and _serialize(row, fields)
+
+    entry = cache.get_or_load(("email", email), lambda: _load(email=email))
+    return entry and entry[1]
+
+
+def get_by_id(pk):
+    """Returns the serialized user with the given id, or ``None``"""
+
+    entry = cache.get_or_load(("id", pk), lambda: _load(pk=pk))
+    return entry and entry[1]
+
+
+def get_many(emails=(), ids=(), fields=None):
+    """
+    Looks many users up by email and by id at once.
+
+    Returns ``{("email", email): payload, ("id", pk): payload}`` for the
+    users found. Cached payloads are used as they are; the others are read
+    with ``IN`` queries of at most ``USERS_LOOKUP_CHUNK_SIZE`` values, per
+    shard, and cached unless ``fields`` narrows them.
+    """
+
+    chunk_size = getattr(settings, "USERS_LOOKUP_CHUNK_SIZE", 500)
+    found = {}
+    missing = {"email": [], "id": []}
+
+    keys = [("email", email) for email in dict.fromkeys(emails)] + [
+        ("id", pk) for pk in dict.fromkeys(ids)
+    ]
+    cached = cache.get_many(keys)
+
+    for key in keys:
+        entry = cached.get(key)
+
+        if entry is None:
+            missing[key[0]].append(key[1])
+        else:
+            found[key] = entry[1] if fields is None else _subset(entry[1], fields)
+
+    # Emails route to a single shard, ids have to be asked of every shard
+    batches = [
+        (alias, "email__in", group)
+        for alias, group in sharding.group_by_shard(
+            missing["email"], email=lambda email: email
+        ).items()
+    ] + [(alias, "pk__in", missing["id"]) for alias in sharding.shards() or [None]]
+
+    generation = cache.generation
+    # The email maps rows back to the lookups that asked for them
+    columns = fields and (*fields, "email")
+
+    for alias, lookup, values in batches:
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start : start + chunk_size]
+
+            for row in _values(columns, using=alias, **{lookup: chunk}):
+                if fields is None:
+                    entry, keys = _entry(row)
+                    cache.put(entry, keys, generation)
+                    payload = entry[1]
+                else:
+                    payload = _serialize(row, fields)
+
+                found[("email", row["email"])] = payload
+                found[("id", row["id"])] = payload
+
+    return found
+
+
+async def aget_by_email(email, fields=None):
+    """
+    Async variant of ``get_by_email``.
+
+    Misses are loaded with the async ORM; concurrent misses are not
+    coalesced here since waiting on other threads would block the loop.
+    """
+
+    entry = await cache.aget(("email", email))
+
+    if entry is None and fields is not None:
+        row = await _values(fields, email=email).afirst()
+        return row and _serialize(row, fields)
+
+    if entry is None:
+        generation = cache.generation
+        row = await _values(email=email).afirst()
+
+        if row is None:
+            return None
+
+        entry, keys = _entry(row)
+        cache.put(entry, keys, generation)
+
+    return entry[1] if fields is None else _subset(entry[1], fields)
+
+
+def invalidate(user, deleted=False):
+    """
+    Drops every cached payload of ``user``, in every process.
+
+    Entries are matched by primary key, so the one stored under an email the
+    user just changed away from goes as well. Other processes drop theirs
+    when they next find them, by the version stamped in the shared cache.
+    """
+
+    shared = _shared()
+
+    if shared is not None:
+        shared.set(
+            VERSION_PREFIX + str(user.pk),
+            DELETED if deleted else exporters.datetime_formatter()(user.date_updated),
+            2 * cache.entries.ttl,
+        )
+
+    cache.invalidate_where(lambda entry: entry[0] == user.pk)
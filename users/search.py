@@ -0,0 +1,187 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.module_loading import import_string
+
+from . import sharding
+
+FIELDS = ("all", "email", "name", "first_name", "last_name")
+INDEXED_FIELDS = ("email", "first_name", "last_name")
+
+# Sorts after every other character, turning a prefix into a range
+PREFIX_END = "\U0010ffff"
+
+FTS_TABLE = "users_user_fts"
+FTS_COLUMNS = {
+    "all": "{email first_name last_name}",
+    "name": "{first_name last_name}",
+    "first_name": "first_name",
+    "last_name": "last_name",
+}
+
+
+class DatabaseSearchBackend:
+    """
+    Portable search backend.
+
+    Every field is matched by case-insensitive prefix with range conditions
+    on ``LOWER(column)``, which the expression indexes on ``User`` turn into
+    index range scans. Results are ordered by the matched column.
+    """
+
+    def search(self, query, field="all", limit=20, offset=0):
+        """Returns the ids of the matching users, best matches first"""
+
+        prefix = query.strip().lower()
+        if not prefix:
+            return []
+
+        columns = {
+            "all": ("email", "first_name", "last_name"),
+            "name": ("first_name", "last_name"),
+        }.get(field, (field,))
+
+        condition = Q()
+        for column in columns:
+            condition |= Q(
+                **{
+                    "%s_lower__gte" % column: prefix,
+                    "%s_lower__lt" % column: prefix + PREFIX_END,
+                }
+            )
+
+        queryset = (
+            get_user_model()
+            .objects.annotate(
+                **{"%s_lower" % column: Lower(column) for column in columns}
+            )
+            .filter(condition)
+            .order_by(*("%s_lower" % column for column in columns), "id")
+        )
+
+        return list(queryset.values_list("id", flat=True)[offset : offset + limit])
+
+    def index(self, users):
+        """Adds or refreshes users in the search index"""
+
+    def remove(self, pks):
+        """Drops users from the search index"""
+
+    def rebuild(self):
+        """Recreates the search index from the user table"""
+
+
+class SQLiteFTSBackend(DatabaseSearchBackend):
+    """
+    Search backend using an SQLite FTS5 shadow table.
+
+    Names and email words are matched as ranked (bm25) full-text prefix
+    terms, so ``q=smi`` finds "John Smith" and "smith.j@example.com" alike.
+    Pure email prefix searches keep using the email index. The shadow table
+    is kept in sync by signals; bulk inserts call ``index()`` themselves.
+    """
+
+    def search(self, query, field="all", limit=20, offset=0):
+        if field == "email":
+            return super().search(query, field, limit, offset)
+
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return []
+
+        match = "%s : (%s)" % (
+            FTS_COLUMNS[field],
+            " AND ".join('"%s"*' % term for term in terms),
+        )
+
+        with self.connection().cursor() as cursor:
+            cursor.execute(
+                "SELECT rowid FROM %s WHERE %s MATCH %%s "
+                "ORDER BY rank LIMIT %%s OFFSET %%s" % (FTS_TABLE, FTS_TABLE),
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, users):
+        rows = [
+            (user.pk, user.email, user.first_name, user.last_name) for user in users
+        ]
+        if not rows:
+            return
+
+        with self.connection().cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM %s WHERE rowid = %%s" % FTS_TABLE,
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                "INSERT INTO %s (rowid, email, first_name, last_name) "
+                "VALUES (%%s, %%s, %%s, %%s)" % FTS_TABLE,
+                rows,
+            )
+
+    def remove(self, pks):
+        with self.connection().cursor() as cursor:
+            cursor.executemany(
+                "DELETE FROM %s WHERE rowid = %%s" % FTS_TABLE,
+                [(pk,) for pk in pks],
+            )
+
+    def rebuild(self):
+        User = get_user_model()
+
+        with self.connection().cursor() as cursor:
+            cursor.execute("DELETE FROM %s" % FTS_TABLE)
+
+            if not sharding.enabled():
+                cursor.execute(
+                    "INSERT INTO %s (rowid, email, first_name, last_name) "
+                    "SELECT id, email, first_name, last_name FROM %s"
+                    % (FTS_TABLE, User._meta.db_table)
+                )
+                return
+
+        # Sharded users are indexed on the default database, user ids are
+        # unique across shards.
+        for alias in sharding.shards():
+            users = User.objects.using(alias).only(*INDEXED_FIELDS)
+            batch = []
+
+            for user in users.iterator(chunk_size=2000):
+                batch.append(user)
+
+                if len(batch) >= 2000:
+                    self.index(batch)
+                    batch = []
+
+            self.index(batch)
+
+    def connection(self):
+        # The index lives on the primary; asking the router would count
+        # every search as a write and pin the client to the primary
+        return connections[sharding.PRIMARY]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """
+    Returns the configured search backend.
+
+    ``USERS_SEARCH_BACKEND`` holds a dotted path; when it is unset, SQLite
+    databases get the FTS5 backend and every other database the portable one.
+    """
+
+    path = getattr(settings, "USERS_SEARCH_BACKEND", None)
+
+    if path:
+        return import_string(path)()
+
+    if connections[sharding.PRIMARY].vendor == "sqlite":
+        return SQLiteFTSBackend()
+
+    return DatabaseSearchBackend()
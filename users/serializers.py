@@ -1,11 +1,19 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
+from django.db import connections
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.db.models.query import ValuesListIterable
 from django.forms import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
 
+from . import exporters, search, sharding
+from .instrumentation import TimedSerializerMixin, phase
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer class for user registration"""
 
     confirm_password = serializers.CharField(
@@ -49,7 +57,190 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)
 
 
-class UpdateUserDetailsSerializer(serializers.ModelSerializer):
+class UserRowIterable(ValuesListIterable):
+    """Yields the rows of ``UserValuesSerializer.values`` as dicts"""
+
+    def __iter__(self):
+        names = [
+            name.removesuffix(UserValuesSerializer.text_suffix)
+            for name in self.queryset._fields
+        ]
+
+        for row in super().__iter__():
+            yield dict(zip(names, row))
+
+
+class UserValuesSerializer:
+    """
+    Read-only counterpart of ``UserSerializer`` for ``values()`` rows.
+
+    Rows come from ``values(queryset)``, which selects the exposed columns
+    and the id only; no model instances are built and no DRF fields walked
+    per row. The output is the same JSON as ``UserSerializer``'s, or only
+    its ``fields`` when given.
+    """
+
+    fields = exporters.EXPORT_FIELDS
+    datetime_fields = ("date_joined", "date_updated")
+    text_suffix = "_as_text"
+
+    def __init__(self, instance=None, many=False, fields=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.selected = fields
+
+    @classmethod
+    def requested_fields(cls, params):
+        """
+        Returns the fields listed in the ``fields`` query parameter.
+
+        Returns ``None``, every field, when the parameter is absent or
+        blank; names outside of ``fields`` are a validation error.
+        """
+
+        names = [
+            name.strip() for name in params.get("fields", "").split(",") if name.strip()
+        ]
+
+        if not names:
+            return None
+
+        unknown = [name for name in names if name not in cls.fields]
+
+        if unknown:
+            raise serializers.ValidationError(
+                {
+                    "fields": [
+                        _("Unknown fields: %(unknown)s. Choose from: %(allowed)s.")
+                        % {
+                            "unknown": ", ".join(unknown),
+                            "allowed": ", ".join(cls.fields),
+                        }
+                    ]
+                }
+            )
+
+        # Output keeps the order of the full payload
+        return tuple(name for name in cls.fields if name in names)
+
+    @classmethod
+    def values(cls, queryset, fields=None):
+        """
+        Narrows ``queryset`` to dicts of ``fields``, the id and the
+        ``date_joined`` pagination orders on; every exposed field by default.
+
+        SQLite stores datetimes as UTC text, which is read as is: parsing it
+        into datetimes only to format them back costs more than the rest of
+        the row. ``exporters.datetime_formatter`` formats either.
+        """
+
+        columns = ["id", *dict.fromkeys(("date_joined", *(fields or cls.fields)))]
+        # Replicas and shards are copies of the primary's settings. Asking
+        # the router for queryset.db would also advance its replica rotation,
+        # and the query would then go to the next replica every time.
+        connection = connections[queryset._db or sharding.PRIMARY]
+
+        if not (
+            settings.USE_TZ
+            and connection.vendor == "sqlite"
+            and connection.timezone_name == "UTC"
+        ):
+            return queryset.values(*columns)
+
+        queryset = queryset.annotate(
+            **{
+                name + cls.text_suffix: Cast(name, CharField())
+                for name in columns
+                if name in cls.datetime_fields
+            }
+        ).values_list(
+            *(
+                name + cls.text_suffix if name in cls.datetime_fields else name
+                for name in columns
+            )
+        )
+        queryset._iterable_class = UserRowIterable
+        return queryset
+
+    @classmethod
+    def to_representation(cls, rows, fields=None):
+        format_datetime = exporters.datetime_formatter()
+
+        if fields is not None:
+            return [
+                {
+                    name: (
+                        format_datetime(row[name])
+                        if name in cls.datetime_fields
+                        else row[name]
+                    )
+                    for name in fields
+                }
+                for row in rows
+            ]
+
+        return [
+            {
+                "email": row["email"],
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "date_joined": format_datetime(row["date_joined"]),
+                "date_updated": format_datetime(row["date_updated"]),
+                "is_staff": row["is_staff"],
+                "is_active": row["is_active"],
+                "is_verified": row["is_verified"],
+            }
+            for row in rows
+        ]
+
+    @property
+    def data(self):
+        with phase("serialize"):
+            if self.many:
+                return self.to_representation(self.instance, self.selected)
+
+            return self.to_representation([self.instance], self.selected)[0]
+
+
+class BulkUserSerializer(UserSerializer):
+    """
+    Serializer class for a single row of a bulk registration
+
+    Email uniqueness is checked for the whole batch at once by the view,
+    instead of with one query per row.
+    """
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            **UserSerializer.Meta.extra_kwargs,
+            "email": {"validators": []},
+        }
+
+
+class BulkRegistrationSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer class for registering many users at once"""
+
+    users = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=getattr(settings, "BULK_REGISTRATION_MAX_SIZE", 1000),
+    )
+
+
+class UserSearchSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer class for user search parameters"""
+
+    q = serializers.CharField(max_length=254)
+    field = serializers.ChoiceField(choices=search.FIELDS, default="all")
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=getattr(settings, "USERS_SEARCH_MAX_LIMIT", 100),
+        default=getattr(settings, "USERS_SEARCH_LIMIT", 20),
+    )
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+
+class UpdateUserDetailsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer class for updating user details"""
 
     class Meta:
@@ -57,7 +248,7 @@ class UpdateUserDetailsSerializer(serializers.ModelSerializer):
         fields = ("id", "email", "first_name", "last_name", "is_verified", "is_staff")
 
 
-class EmailVerificationSerializer(serializers.ModelSerializer):
+class EmailVerificationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer class for email verification of users"""
 
     token = serializers.CharField(trim_whitespace=True)
@@ -67,19 +258,19 @@ class EmailVerificationSerializer(serializers.ModelSerializer):
         fields = ["token"]
 
 
-class SendEmailVerificationSerializer(serializers.Serializer):
+class SendEmailVerificationSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer class for sending email verification"""
 
     email = serializers.EmailField()
 
 
-class SendPasswordResetEmailSerializer(serializers.Serializer):
+class SendPasswordResetEmailSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer class for sending password reset email"""
 
     email = serializers.EmailField()
 
 
-class ResetPasswordSerializer(serializers.Serializer):
+class ResetPasswordSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer class for resetting password"""
 
     password = serializers.CharField(max_length=250, style={"input_type": "password"})
@@ -100,14 +291,18 @@ class ResetPasswordSerializer(serializers.Serializer):
         return super().validate(attrs)
 
 
-class AuthTokenSerializer(serializers.Serializer):
-    """Serializer class for authenticating user"""
+class CredentialsSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer class for login credentials, without authenticating them"""
 
     email = serializers.EmailField(max_length=255, min_length=3)
     password = serializers.CharField(
         max_length=68, min_length=8, write_only=True, style={"input_type": "password"}
     )
 
+
+class AuthTokenSerializer(CredentialsSerializer):
+    """Serializer class for authenticating user"""
+
     def validate(self, attrs):
         email = attrs.get("email")
         password = attrs.get("password")
@@ -135,7 +330,55 @@ class AuthTokenSerializer(serializers.Serializer):
         return attrs
 
 
-class TokenVerificationSerializer(serializers.Serializer):
+class TokenVerificationSerializer(TimedSerializerMixin, serializers.Serializer):
     """Serializer class for token verification"""
 
     token = serializers.CharField(trim_whitespace=True)
+
+
+class BatchTokenVerificationSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer class for verifying many tokens at once"""
+
+    tokens = serializers.ListField(
+        child=serializers.CharField(trim_whitespace=True),
+        allow_empty=False,
+        max_length=getattr(settings, "TOKEN_BATCH_MAX_SIZE", 100),
+    )
+
+
+class JWTRefreshSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer class for refreshing a JSON Web Token pair"""
+
+    refresh = serializers.CharField(trim_whitespace=True)
+
+
+class JWTRevokeSerializer(JWTRefreshSerializer):
+    """Serializer class for revoking a JSON Web Token pair"""
+
+    access = serializers.CharField(trim_whitespace=True, required=False)
+
+
+class BatchUserLookupSerializer(TimedSerializerMixin, serializers.Serializer):
+    """Serializer class for looking many users up by email or id"""
+
+    emails = serializers.ListField(
+        child=serializers.CharField(trim_whitespace=True), required=False
+    )
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False
+    )
+
+    def validate(self, attrs):
+        count = len(attrs.get("emails", [])) + len(attrs.get("ids", []))
+        max_size = getattr(settings, "USERS_LOOKUP_MAX_SIZE", 1000)
+
+        if not count:
+            raise serializers.ValidationError(_("Provide emails, ids or both"))
+
+        if count > max_size:
+            raise serializers.ValidationError(
+                _("At most %(max_size)d users can be looked up at once")
+                % {"max_size": max_size}
+            )
+
+        return attrs
@@ -0,0 +1,306 @@
+import hashlib
+import heapq
+import itertools
+import os
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import BaseUserManager
+from django.db import transaction
+from django.db.models import F, Max
+
+PRIMARY = "default"
+
+# Token keys start with the routing key of their user's email, so a token
+# can be routed to its shard without a lookup.
+ROUTING_KEY_LENGTH = 8
+
+# Set while ``relocate`` deletes the originals of the users it moved, the
+# delete signals it sends are not about users going away
+relocating = ContextVar("relocating", default=False)
+
+
+def shards():
+    """Aliases of the databases users are sharded over, empty when unsharded"""
+
+    return getattr(settings, "USER_SHARDS", [])
+
+
+def enabled():
+    return bool(shards())
+
+
+def routing_key(email):
+    """Stable routing key of an email address"""
+
+    normalized = BaseUserManager.normalize_email(email)
+    return hashlib.sha256(normalized.encode()).hexdigest()[:ROUTING_KEY_LENGTH]
+
+
+def shard_for_key(key):
+    """
+    Picks the shard of a routing key by rendezvous hashing.
+
+    Every shard scores the key and the highest score wins, so adding a
+    shard only moves the keys the new shard wins, about 1/N of them.
+    """
+
+    return max(
+        shards(),
+        key=lambda alias: hashlib.sha256(("%s:%s" % (alias, key)).encode()).digest(),
+    )
+
+
+def shard_for_email(email):
+    """Returns the shard of the user with ``email``, ``None`` when unsharded"""
+
+    if not enabled():
+        return None
+
+    return shard_for_key(routing_key(email))
+
+
+def shard_for_token(key):
+    """Returns the shard of the token ``key``, ``None`` when unsharded"""
+
+    if not enabled():
+        return None
+
+    return shard_for_key(key[:ROUTING_KEY_LENGTH])
+
+
+def db_for_user(user):
+    """Returns the shard holding ``user``, ``None`` when unsharded"""
+
+    if not enabled():
+        return None
+
+    return user._state.db or shard_for_email(user.email)
+
+
+def make_token_key(email):
+    """Random 40 character token key carrying the routing key of ``email``"""
+
+    return routing_key(email) + os.urandom(20).hex()[ROUTING_KEY_LENGTH:]
+
+
+def first(queryset):
+    """``queryset.first()``, asking every shard unless the query is routed"""
+
+    if not enabled() or queryset._db is not None:
+        return queryset.first()
+
+    for alias in shards():
+        found = queryset.using(alias).first()
+
+        if found is not None:
+            return found
+
+    return None
+
+
+async def afirst(queryset):
+    """Async variant of ``first``"""
+
+    if not enabled() or queryset._db is not None:
+        return await queryset.afirst()
+
+    for alias in shards():
+        found = await queryset.using(alias).afirst()
+
+        if found is not None:
+            return found
+
+    return None
+
+
+def gather(queryset, limit, key):
+    """
+    Returns the first ``limit`` rows of an ordered queryset across shards.
+
+    Every shard returns its own first ``limit`` rows, which are merged by
+    ``key``; it must sort rows the same way the queryset's ordering does.
+    """
+
+    if not enabled():
+        return list(queryset[:limit])
+
+    partials = [list(queryset.using(alias)[:limit]) for alias in shards()]
+    return list(itertools.islice(heapq.merge(*partials, key=key), limit))
+
+
+def in_bulk(queryset, pks):
+    """``queryset.in_bulk(pks)`` across shards"""
+
+    if not enabled():
+        return queryset.in_bulk(pks)
+
+    found = {}
+
+    for alias in shards():
+        found.update(queryset.using(alias).in_bulk(pks))
+
+    return found
+
+
+def iterator(queryset, chunk_size):
+    """``queryset.iterator()`` walking the shards one after the other"""
+
+    if not enabled():
+        return queryset.iterator(chunk_size=chunk_size)
+
+    return itertools.chain.from_iterable(
+        queryset.using(alias).iterator(chunk_size=chunk_size) for alias in shards()
+    )
+
+
+def group_by_shard(objects, email=lambda obj: obj.email):
+    """
+    Groups ``objects`` by the shard of their email.
+
+    Returns ``{alias: [objects]}``, with a single ``None`` alias when
+    unsharded.
+    """
+
+    groups = {}
+
+    for obj in objects:
+        groups.setdefault(shard_for_email(email(obj)), []).append(obj)
+
+    return groups
+
+
+def existing_emails(emails):
+    """Returns the subset of ``emails`` that already belong to a user"""
+
+    User = get_user_model()
+    found = set()
+
+    for alias, group in group_by_shard(emails, email=lambda email: email).items():
+        found.update(
+            User.objects.using(alias)
+            .filter(email__in=group)
+            .values_list("email", flat=True)
+        )
+
+    return found
+
+
+def atomic(aliases):
+    """
+    Opens a transaction on every database in ``aliases``.
+
+    They commit one after the other when the block exits; this is not a
+    two-phase commit, a crash in between can leave one of them applied.
+    """
+
+    stack = ExitStack()
+
+    for alias in dict.fromkeys(aliases):
+        stack.enter_context(transaction.atomic(using=alias))
+
+    return stack
+
+
+def highest_user_id():
+    User = get_user_model()
+
+    return max(
+        User.objects.using(alias).aggregate(highest=Max("id"))["highest"] or 0
+        for alias in [PRIMARY, *shards()]
+    )
+
+
+def allocate_ids(count, name="users.User"):
+    """Reserves ``count`` consecutive ids from the ``IdSequence`` ``name``"""
+
+    from .models import IdSequence
+
+    sequences = IdSequence.objects.using(PRIMARY).filter(name=name)
+
+    # The UPDATE takes the write lock before the new value is read back, so
+    # concurrent callers never get overlapping ranges.
+    with transaction.atomic(using=PRIMARY):
+        if not sequences.update(value=F("value") + count):
+            IdSequence.objects.using(PRIMARY).get_or_create(
+                name=name, defaults={"value": highest_user_id()}
+            )
+            sequences.update(value=F("value") + count)
+
+        last = sequences.values_list("value", flat=True).get()
+
+    return range(last - count + 1, last + 1)
+
+
+def assign_ids(users):
+    """Gives unsaved users globally unique ids when sharding is enabled"""
+
+    if not enabled():
+        return
+
+    pending = [user for user in users if user.pk is None]
+
+    for user, pk in zip(pending, allocate_ids(len(pending))):
+        user.pk = pk
+
+
+def relocate(users, source):
+    """
+    Moves users stored on ``source`` to the shard their email maps to.
+
+    Users are copied with their tokens first and deleted from ``source``
+    afterwards; copies already present are skipped, so running it again
+    after a crash is harmless. A token whose key does not route to the new
+    shard, because the email changed or it predates sharding, is replaced by
+    a fresh key. Group and permission memberships are not moved. Returns the
+    number of users moved.
+    """
+
+    from rest_framework.authtoken.models import Token
+
+    from . import search
+
+    User = get_user_model()
+    moving = [user for user in users if shard_for_email(user.email) != source]
+
+    if not moving:
+        return 0
+
+    tokens = {}
+    for token in Token.objects.using(source).filter(
+        user_id__in=[user.pk for user in moving]
+    ):
+        tokens.setdefault(token.user_id, []).append(token)
+
+    for target, group in group_by_shard(moving).items():
+        copied = set(
+            User.objects.using(target)
+            .filter(pk__in=[user.pk for user in group])
+            .values_list("pk", flat=True)
+        )
+
+        # Raw saves keep date_joined and Token.created as they are
+        with transaction.atomic(using=target):
+            for user in group:
+                if user.pk in copied:
+                    continue
+
+                user.save_base(using=target, raw=True, force_insert=True)
+
+                for token in tokens.get(user.pk, ()):
+                    if shard_for_token(token.key) != target:
+                        token.key = make_token_key(user.email)
+                    token.save_base(using=target, raw=True, force_insert=True)
+
+    token = relocating.set(True)
+    try:
+        User.objects.using(source).filter(pk__in=[user.pk for user in moving]).delete()
+    finally:
+        relocating.reset(token)
+
+    # Deleting the originals dropped them from the search index
+    search.get_backend().index(moving)
+
+    return len(moving)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from . import authentication, instrumentation, jwt_tokens, profiles, search, sharding
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    instrumentation.instrument(connection)
+
+
+@receiver(pre_save, sender=get_user_model())
+def assign_user_id(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sharding.assign_ids([instance])
+
+
+@receiver(post_save, sender=get_user_model())
+def relocate_user(sender, instance, raw=False, **kwargs):
+    # A new email can map the user to another shard
+    if (
+        not raw
+        and sharding.enabled()
+        and instance._state.db != sharding.shard_for_email(instance.email)
+    ):
+        sharding.relocate([instance], instance._state.db)
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_user_tokens(sender, instance, **kwargs):
+    authentication.invalidate_user(instance)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def revoke_user_jwts(sender, instance, signal, **kwargs):
+    # Stateless tokens carry no user row to check, blocked and deleted users
+    # are denylisted instead. A user moved to another shard is neither.
+    if sharding.relocating.get():
+        return
+
+    if signal is post_delete or not instance.is_active:
+        jwt_tokens.revoke_user(instance)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_user_profile(sender, instance, signal, **kwargs):
+    # A user moved to another shard is still there
+    profiles.invalidate(
+        instance, deleted=signal is post_delete and not sharding.relocating.get()
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def index_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(
+        search.INDEXED_FIELDS
+    ):
+        return
+
+    search.get_backend().index([instance])
+
+
+@receiver(post_delete, sender=get_user_model())
+def unindex_user(sender, instance, **kwargs):
+    search.get_backend().remove([instance.pk])
@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from asgiref.sync import sync_to_async
+from rest_framework.authtoken.models import Token
+
+from . import sharding
+
+
+def for_key(key):
+    """``Token`` manager bound to the database holding the token ``key``"""
+
+    return Token.objects.db_manager(sharding.shard_for_token(key))
+
+
+def build(user):
+    """Unsaved token for ``user``, with a key routed to the user's shard"""
+
+    return Token(key=sharding.make_token_key(user.email), user=user)
+
+
+def get_or_create(user):
+    """
+    Returns ``(token, created)`` for ``user``, like ``get_or_create``.
+
+    An expired token is replaced by a new one, reported as created.
+    """
+
+    token, created = Token.objects.db_manager(sharding.db_for_user(user)).get_or_create(
+        user=user, defaults={"key": sharding.make_token_key(user.email)}
+    )
+
+    if not created and is_expired(token):
+        return rotate(user), True
+
+    if not created and is_stale(token):
+        refresh([token])
+
+    return token, created
+
+
+async def aget_or_create(user):
+    token, created = await Token.objects.db_manager(
+        sharding.db_for_user(user)
+    ).aget_or_create(user=user, defaults={"key": sharding.make_token_key(user.email)})
+
+    if not created and is_expired(token):
+        return await arotate(user), True
+
+    if not created and is_stale(token):
+        await arefresh(token)
+
+    return token, created
+
+
+def rotate(user):
+    """Replaces the token of ``user`` with one with a new key, returns it"""
+
+    alias = sharding.db_for_user(user) or sharding.PRIMARY
+
+    # Deleting through the ORM lets the token caches forget the old key
+    with transaction.atomic(using=alias):
+        Token.objects.using(alias).filter(user_id=user.pk).delete()
+        return Token.objects.using(alias).create(
+            key=sharding.make_token_key(user.email), user=user
+        )
+
+
+async def arotate(user):
+    # The delete and the insert must share a transaction, which the async
+    # ORM cannot open
+    return await sync_to_async(rotate)(user)
+
+
+def ttl():
+    """Lifetime of an unused token, ``None`` when tokens never expire"""
+
+    seconds = getattr(settings, "TOKEN_TTL", 0)
+    return timedelta(seconds=seconds) if seconds else None
+
+
+def is_expired(token, now=None):
+    lifetime = ttl()
+
+    if lifetime is None:
+        return False
+
+    return token.created <= (now or timezone.now()) - lifetime
+
+
+def is_stale(token, now=None):
+    """Whether using ``token`` should slide its expiry forward"""
+
+    if ttl() is None:
+        return False
+
+    interval = timedelta(seconds=getattr(settings, "TOKEN_REFRESH_INTERVAL", 86400))
+    return token.created <= (now or timezone.now()) - interval
+
+
+def refresh(tokens):
+    """
+    Restarts the lifetime of ``tokens`` from now, one update per shard.
+
+    ``Token.created`` is the anchor of the lifetime; the instances are
+    updated in place so cached copies see the new date.
+    """
+
+    now = timezone.now()
+    keys = {}
+
+    for token in tokens:
+        token.created = now
+        keys.setdefault(sharding.shard_for_token(token.key), []).append(token.key)
+
+    for alias, shard_keys in keys.items():
+        Token.objects.db_manager(alias).filter(key__in=shard_keys).update(created=now)
+
+
+async def arefresh(token):
+    token.created = timezone.now()
+    await for_key(token.key).filter(key=token.key).aupdate(created=token.created)
+
+
+def databases():
+    """Aliases of every database that may hold tokens"""
+
+    return list(dict.fromkeys([sharding.PRIMARY, *sharding.shards()]))
+
+
+def purge_expired(alias, batch_size, now=None):
+    """
+    Deletes the expired tokens of database ``alias`` by batches.
+
+    Yields the number of rows deleted by each batch. Every batch is a short
+    transaction of its own, so writers are never blocked for long.
+    """
+
+    lifetime = ttl()
+
+    if lifetime is None:
+        return
+
+    cutoff = (now or timezone.now()) - lifetime
+
+    while True:
+        keys = list(
+            Token.objects.using(alias)
+            .filter(created__lte=cutoff)
+            .order_by("created")
+            .values_list("key", flat=True)[:batch_size]
+        )
+
+        if not keys:
+            return
+
+        deleted, _ = (
+            Token.objects.using(alias)
+            .filter(key__in=keys, created__lte=cutoff)
+            .delete()
+        )
+        yield deleted
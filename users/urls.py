@@ -1,21 +1,37 @@
-from django.urls import path
+from django.urls import include, path
 
 from . import views
 
 urlpatterns = [
     path("", views.api_root, name="main"),
     path("all/", views.AllUsersView.as_view(), name="all-users"),
+    path("search/", views.SearchUsersView.as_view(), name="search-users"),
+    path("export/", views.ExportUsersView.as_view(), name="export-users"),
     path("register/", views.RegistrationView.as_view(), name="registration"),
+    path(
+        "register/bulk/",
+        views.BulkRegistrationView.as_view(),
+        name="bulk-registration",
+    ),
     path(
         "user/<str:email>/", views.RetrieveUserAPIView.as_view(), name="retrieve-user"
     ),
+    path("lookup/", views.BatchUserLookupAPIView.as_view(), name="lookup-users"),
     path(
         "user/update/<str:email>/",
         views.UpdateUserDetailsAPIView.as_view(),
         name="update-user",
     ),
     path("token/", views.AuthTokenAPIView.as_view(), name="token"),
+    path("jwt/", views.JWTObtainAPIView.as_view(), name="jwt"),
+    path("jwt/refresh/", views.JWTRefreshAPIView.as_view(), name="jwt-refresh"),
+    path("jwt/revoke/", views.JWTRevokeAPIView.as_view(), name="jwt-revoke"),
     path("verify-token/", views.VerifyTokenAPIView.as_view(), name="verify-token"),
+    path(
+        "verify-token/batch/",
+        views.BatchVerifyTokenAPIView.as_view(),
+        name="verify-token-batch",
+    ),
     path(
         "verify-email/<str:token>/",
         views.EmailVerificationView.as_view(),
@@ -36,4 +52,5 @@ urlpatterns = [
         views.PasswordResetAPIView.as_view(),
         name="reset-password",
     ),
+    path("async/", include(("users.async_urls", "async"))),
 ]
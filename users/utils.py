@@ -1,10 +1,132 @@
-from django.core.mail import EmailMessage
+import logging
+import smtplib
+import threading
+from collections import namedtuple
+from time import monotonic, perf_counter
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from .instrumentation import phase
+
+logger = logging.getLogger(__name__)
+
+
+class BatchReport(namedtuple("BatchReport", ["sent", "failed", "seconds", "outcomes"])):
+    """Outcome and throughput of a batch of emails"""
+
+    @property
+    def rate(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+
+# Errors after which the connection is assumed dead and worth reopening
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
 
 
 class Mail:
+    """
+    Email delivery engine.
+
+    Every thread keeps its own connection to the email backend open between
+    messages, so the SMTP/TLS handshake is paid once per worker instead of
+    once per email. Connections idle for longer than ``EMAIL_CONNECTION_MAX_IDLE``
+    seconds, or dropped by the server, are reopened transparently.
+    """
+
+    _local = threading.local()
+
     @staticmethod
-    def send_mail(data):
-        email = EmailMessage(
+    def build_message(data):
+        return EmailMessage(
             subject=data["email_subject"], body=data["email_body"], to=data["to_email"]
         )
-        email.send()
+
+    @classmethod
+    def send_mail(cls, data):
+        report = cls.send_messages([cls.build_message(data)])
+
+        if report.failed:
+            raise report.outcomes[0]
+
+    @classmethod
+    @phase("mail")
+    def send_messages(cls, messages):
+        """
+        Delivers a batch of messages over the thread's connection.
+
+        SMTP has no multi-message command, so messages still go out one
+        transaction at a time; what the batch shares is the connection.
+        A failing message does not stop the rest of the batch: the returned
+        report holds ``None`` for every delivered message and the exception
+        for every failed one, in order.
+        """
+
+        started = perf_counter()
+        outcomes = []
+
+        for message in messages:
+            try:
+                cls._send(message)
+            except Exception as error:
+                outcomes.append(error)
+            else:
+                outcomes.append(None)
+
+        failed = sum(outcome is not None for outcome in outcomes)
+        report = BatchReport(
+            sent=len(outcomes) - failed,
+            failed=failed,
+            seconds=perf_counter() - started,
+            outcomes=outcomes,
+        )
+
+        if len(messages) > 1:
+            logger.info(
+                "Sent %d/%d emails in %.3fs (%.1f emails/s)",
+                report.sent,
+                len(messages),
+                report.seconds,
+                report.rate,
+            )
+
+        return report
+
+    @classmethod
+    def get_connection(cls):
+        connection = getattr(cls._local, "connection", None)
+        max_idle = getattr(settings, "EMAIL_CONNECTION_MAX_IDLE", 60)
+
+        if connection is not None and monotonic() - cls._local.used_at > max_idle:
+            # Servers drop idle clients on their own, reconnecting up front
+            # saves a failed send.
+            cls.close()
+            connection = None
+
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            cls._local.connection = connection
+
+        cls._local.used_at = monotonic()
+
+        return connection
+
+    @classmethod
+    def close(cls):
+        connection = getattr(cls._local, "connection", None)
+        cls._local.connection = None
+
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                logger.debug("Ignoring error while closing email connection")
+
+    @classmethod
+    def _send(cls, message):
+        try:
+            cls.get_connection().send_messages([message])
+        except CONNECTION_ERRORS:
+            cls.close()
+            cls.get_connection().send_messages([message])
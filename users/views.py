@@ -1,17 +1,47 @@
+import re
+from datetime import datetime, time
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.sites.shortcuts import get_current_site
+from django.db import IntegrityError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
+from django.views.decorators.http import condition
 
 from rest_framework import generics, permissions, status, views
-from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.settings import api_settings
-
-from . import serializers, utils
+from rest_framework.utils.urls import replace_query_param
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import (
+    authentication,
+    emails,
+    exporters,
+    hashing,
+    jwt_tokens,
+    links,
+    metrics,
+    outbox,
+    pagination,
+    profiles,
+    search,
+    serializers,
+    sharding,
+    tokens,
+)
 
 # Create your views here.
 
@@ -23,6 +53,7 @@ def api_root(request, format=None):
             "register": reverse("registration", request=request, format=None),
             "all-users": reverse("all-users", request=request, format=None),
             "token": reverse("token", request=request, format=None),
+            "jwt": reverse("jwt", request=request, format=None),
             "verify-token": reverse("verify-token", request=request, format=None),
             "send-verification-email": reverse(
                 "send-verification-email", request=request, format=None
@@ -35,11 +66,170 @@ def api_root(request, format=None):
 
 
 class AllUsersView(generics.ListAPIView):
-    """API view for listing all the users"""
+    """
+    API view for listing all the users
 
-    serializer_class = serializers.UserSerializer
+    Results are cursor paginated on ``(date_joined, id)`` and can be narrowed
+    down with the ``is_active``, ``is_verified``, ``joined_after`` and
+    ``joined_before`` query parameters. ``fields`` is a comma separated list
+    of the fields to return, only their columns are read.
+    """
+
+    serializer_class = serializers.UserValuesSerializer
     permission_classes = (permissions.AllowAny,)
+    pagination_class = pagination.UserCursorPagination
     queryset = get_user_model().objects.all()
+    fields = None
+
+    boolean_filters = ("is_active", "is_verified")
+    truthy_values = ("1", "true", "yes")
+    falsy_values = ("0", "false", "no")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+
+        for field in self.boolean_filters:
+            if field in params:
+                queryset = queryset.filter(
+                    **{field: self.parse_boolean(field, params[field])}
+                )
+
+        if "joined_after" in params:
+            queryset = queryset.filter(
+                date_joined__gte=self.parse_moment("joined_after", time.min)
+            )
+
+        if "joined_before" in params:
+            queryset = queryset.filter(
+                date_joined__lte=self.parse_moment("joined_before", time.max)
+            )
+
+        return self.serializer_class.values(queryset, self.fields)
+
+    def list(self, request, *args, **kwargs):
+        self.fields = self.serializer_class.requested_fields(request.query_params)
+        return super().list(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, fields=self.fields, **kwargs)
+
+    def parse_boolean(self, name, value):
+        value = value.lower()
+
+        if value in self.truthy_values:
+            return True
+
+        if value in self.falsy_values:
+            return False
+
+        raise ValidationError({name: _("Must be a boolean value")})
+
+    def parse_moment(self, name, default_time):
+        """Parses an ISO datetime or date, a bare date spans the whole day"""
+
+        value = self.request.query_params[name]
+
+        try:
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                moment = day and datetime.combine(day, default_time)
+        except ValueError:
+            moment = None
+
+        if moment is None:
+            raise ValidationError({name: _("Must be an ISO 8601 date or datetime")})
+
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+
+        return moment
+
+
+class SearchUsersView(views.APIView):
+    """
+    API view for searching users by email, name or both
+
+    ``q`` is matched by prefix against the field picked with ``field``;
+    results are ranked by the search backend and paged with ``limit`` and
+    ``offset``.
+    """
+
+    serializer_class = serializers.UserSearchSerializer
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+
+        serializer = self.serializer_class(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        ids = search.get_backend().search(
+            params["q"],
+            field=params["field"],
+            limit=params["limit"] + 1,
+            offset=params["offset"],
+        )
+        page = ids[: params["limit"]]
+
+        rows = serializers.UserValuesSerializer.values(
+            get_user_model().objects.filter(pk__in=page)
+        )
+        users = {row["id"]: row for row in sharding.iterator(rows, len(page) or 1)}
+        results = serializers.UserValuesSerializer(
+            [users[pk] for pk in page if pk in users], many=True
+        ).data
+
+        next_link = None
+        if len(ids) > params["limit"]:
+            next_link = replace_query_param(
+                request.build_absolute_uri(),
+                "offset",
+                params["offset"] + params["limit"],
+            )
+
+        return Response({"next": next_link, "results": results})
+
+
+class ExportUsersView(views.APIView):
+    """
+    API view streaming every user as NDJSON or CSV
+
+    The ``output`` query parameter picks the format (``ndjson`` by default)
+    and the body is gzip-encoded on the fly when the client accepts it.
+    """
+
+    permission_classes = (permissions.IsAdminUser,)
+    accepts_gzip = re.compile(r"\bgzip\b")
+
+    def get(self, request):
+
+        export_format = request.query_params.get("output", "ndjson")
+
+        if export_format not in exporters.CONTENT_TYPES:
+            raise ValidationError(
+                {"output": _("Must be one of: %s") % ", ".join(exporters.CONTENT_TYPES)}
+            )
+
+        compress = bool(
+            self.accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        )
+
+        response = StreamingHttpResponse(
+            exporters.export_users(export_format=export_format, compress=compress),
+            content_type=exporters.CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = 'attachment; filename="users.%s"' % (
+            export_format
+        )
+
+        if compress:
+            response["Content-Encoding"] = "gzip"
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        return response
 
 
 class RegistrationView(generics.GenericAPIView):
@@ -60,19 +250,13 @@ class RegistrationView(generics.GenericAPIView):
         # Sending verification email
         user = get_user_model().objects.get(email=user_data["email"])
 
-        token, created_at  = Token.objects.get_or_create(user=user)
-        current_site_domain = get_current_site(request).domain
-        relativeLink = reverse("verify-email", kwargs={"token": token})
-        verification_link = "http://" + current_site_domain + relativeLink
-        message = ". Use this link to verify your email. \n If you were not expecting account verification email, please ignore this message \n."
-        email_body = "Hi " + user.first_name + message + verification_link
-        data = {
-            "email_body": email_body,
-            "email_subject": "Verify you account",
-            "to_email": [user.email],
-        }
+        data = emails.account_verification_email(
+            get_current_site(request).domain,
+            user,
+            links.email_verification.make_link_token(user),
+        )
 
-        utils.Mail.send_mail(data=data)
+        outbox.enqueue(data=data)
 
         return Response(
             {"status": _("Verify your email"), "user": user_data},
@@ -80,6 +264,163 @@ class RegistrationView(generics.GenericAPIView):
         )
 
 
+class BulkRegistrationView(generics.GenericAPIView):
+    """
+    API view responsible for registering many users at once
+
+    Every row is validated like a regular registration. Valid rows are
+    created together, with their verification emails, in one transaction
+    per database; the response reports the outcome of each row.
+    """
+
+    serializer_class = serializers.BulkRegistrationSerializer
+    row_serializer_class = serializers.BulkUserSerializer
+    permission_classes = (permissions.IsAdminUser,)
+
+    def post(self, request):
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.validated_data["users"]
+
+        User = get_user_model()
+        results = [None] * len(rows)
+        valid = {}
+
+        for index, row in enumerate(rows):
+            row_serializer = self.row_serializer_class(data=row)
+
+            if not row_serializer.is_valid():
+                results[index] = {
+                    "index": index,
+                    "status": "error",
+                    "errors": row_serializer.errors,
+                }
+                continue
+
+            attrs = row_serializer.validated_data
+            attrs["email"] = User.objects.normalize_email(attrs["email"])
+
+            if attrs["email"] in valid:
+                results[index] = self.duplicate(index)
+                continue
+
+            valid[attrs["email"]] = (index, attrs)
+
+        taken = sharding.existing_emails(list(valid))
+
+        for email in taken:
+            index, attrs = valid.pop(email)
+            results[index] = self.duplicate(index)
+
+        pending = list(valid.values())
+        passwords = hashing.make_passwords(
+            attrs["password"] for _index, attrs in pending
+        )
+        users = [
+            User(
+                email=attrs["email"],
+                first_name=attrs["first_name"],
+                last_name=attrs["last_name"],
+                password=password,
+            )
+            for (_index, attrs), password in zip(pending, passwords)
+        ]
+
+        chunk_size = getattr(settings, "BULK_REGISTRATION_CHUNK_SIZE", 500)
+        domain = get_current_site(request).domain
+
+        sharding.assign_ids(users)
+        shards = sharding.group_by_shard(users)
+
+        try:
+            # The default database holds the outbox and the search index
+            with sharding.atomic([None, *shards]):
+                for alias, shard_users in shards.items():
+                    User.objects.using(alias).bulk_create(
+                        shard_users, batch_size=chunk_size
+                    )
+
+                outbox.enqueue_many(
+                    emails.account_verification_email(
+                        domain, user, links.email_verification.make_link_token(user)
+                    )
+                    for user in users
+                )
+                search.get_backend().index(users)
+        except IntegrityError:
+            return Response(
+                {"status": _("Some emails were registered concurrently, try again")},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        created = serializers.UserSerializer(users, many=True).data
+
+        for (index, _attrs), user_data in zip(pending, created):
+            results[index] = {"index": index, "status": "created", "user": user_data}
+
+        return Response(
+            {
+                "created": len(users),
+                "failed": len(rows) - len(users),
+                "results": results,
+            },
+            status=status.HTTP_201_CREATED if users else status.HTTP_400_BAD_REQUEST,
+        )
+
+    def duplicate(self, index):
+        return {
+            "index": index,
+            "status": "error",
+            "errors": {"email": [_("user with this email already exists.")]},
+        }
+
+
+def user_version(request, email):
+    """
+    Returns ``(pk, date_updated)`` of the user with the given email.
+
+    Read from the database, two columns only, once per request however many
+    validators ask for it. Cached profiles are not trusted here, another
+    process may have updated the user since they were loaded.
+    """
+
+    if not hasattr(request, "_user_version"):
+        request._user_version = (
+            get_user_model()
+            .objects.filter(email=email)
+            .values_list("pk", "date_updated")
+            .first()
+        )
+
+    return request._user_version
+
+
+def user_etag(request, email, **kwargs):
+    version = user_version(request, email)
+
+    if version is None:
+        return None
+
+    pk, date_updated = version
+    return '"%s-%s"' % (pk, int(date_updated.timestamp() * 1000000))
+
+
+def user_last_modified(request, email, **kwargs):
+    version = user_version(request, email)
+    return version and version[1]
+
+
+# User.date_updated changes on every save, which makes it a validator for
+# the user's representation: matching If-None-Match/If-Modified-Since
+# requests get a 304 without the user being loaded or serialized.
+conditional_user_get = method_decorator(
+    condition(etag_func=user_etag, last_modified_func=user_last_modified),
+    name="get",
+)
+
+
+@conditional_user_get
 class RetrieveUserAPIView(generics.RetrieveDestroyAPIView):
     """API view responsible for retrieving a user"""
 
@@ -89,7 +430,62 @@ class RetrieveUserAPIView(generics.RetrieveDestroyAPIView):
     def get_object(self):
         return get_user_model().objects.get(email=self.kwargs.get("email"))
 
+    def retrieve(self, request, *args, **kwargs):
+        email = self.kwargs.get("email")
+        # The validators already read the version, the body must match it
+        version = user_version(request, email)
+
+        payload = profiles.get_by_email(
+            email,
+            serializers.UserValuesSerializer.requested_fields(request.query_params),
+            version and version[1],
+        )
+
+        if payload is None:
+            raise NotFound()
+
+        return Response(payload)
+
 
+class BatchUserLookupAPIView(views.APIView):
+    """
+    API view responsible for looking many users up by email or id
+
+    Results follow the order of the request, emails first and ids next;
+    users that do not exist are returned with ``found`` false. ``fields``
+    narrows the user payloads like on the other user endpoints.
+    """
+
+    serializer_class = serializers.BatchUserLookupSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        emails = serializer.validated_data.get("emails", [])
+        ids = serializer.validated_data.get("ids", [])
+
+        found = profiles.get_many(
+            emails,
+            ids,
+            serializers.UserValuesSerializer.requested_fields(request.query_params),
+        )
+        results = []
+
+        for kind, values in (("email", emails), ("id", ids)):
+            for value in values:
+                payload = found.get((kind, value))
+
+                if payload is None:
+                    results.append({kind: value, "found": False})
+                else:
+                    results.append({kind: value, "found": True, "user": payload})
+
+        return Response({"results": results})
+
+
+@conditional_user_get
 class UpdateUserDetailsAPIView(generics.RetrieveUpdateAPIView):
     """API view responsible for updating user details"""
 
@@ -108,34 +504,31 @@ class EmailVerificationView(views.APIView):
 
     def get(self, request, token):
 
-        try:
-            user_token = Token.objects.get(key=token)
-
-            user = get_user_model().objects.get(id=user_token.user.id)
-
-            if not user.is_verified:
-                user.is_verified = True
-                user.is_active = True
-                user.save()
+        user = links.email_verification.get_user(token)
 
-            return Response(
-                {
-                    "status": _("Email successfully verified"),
-                    "user": {
-                        "first_name": user.first_name,
-                        "last_name": user.last_name,
-                        "email": user.email,
-                        "is_verified": user.is_verified,
-                    },
-                },
-                status=status.HTTP_200_OK,
-            )
-
-        except Token.DoesNotExist:
+        if user is None:
             return Response(
                 {"status": _("Invalid Token")}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        if not user.is_verified:
+            user.is_verified = True
+            user.is_active = True
+            user.save()
+
+        return Response(
+            {
+                "status": _("Email successfully verified"),
+                "user": {
+                    "first_name": user.first_name,
+                    "last_name": user.last_name,
+                    "email": user.email,
+                    "is_verified": user.is_verified,
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
 class SendEmailVerificationView(views.APIView):
     """API view responsible for sending email verification"""
@@ -152,19 +545,13 @@ class SendEmailVerificationView(views.APIView):
         try:
             user = get_user_model().objects.get(email=email)
 
-            token, created_at = Token.objects.get_or_create(user=user)
-            current_site_domain = get_current_site(request).domain
-            relativeLink = reverse("verify-email", kwargs={"token": token})
-            verification_link = "http://" + current_site_domain + relativeLink
-            message = ". Use this link to verify your email. \n If you were not expecting any email verification, please ignore this message. \n"
-            email_body = "Hi " + user.first_name + message + verification_link
-            data = {
-                "email_subject": "Email Verification",
-                "email_body": email_body,
-                "to_email": [email],
-            }
+            data = emails.email_verification_email(
+                get_current_site(request).domain,
+                user,
+                links.email_verification.make_link_token(user),
+            )
 
-            utils.Mail.send_mail(data=data)
+            outbox.enqueue(data=data)
 
             return Response(
                 {"status": _("Email verification sent successfully")},
@@ -193,19 +580,13 @@ class SendPasswordResetEmailAPIView(views.APIView):
         try:
             user = get_user_model().objects.get(email=email)
 
-            token, created_at = Token.objects.get_or_create(user=user)
-            current_site_domain = get_current_site(request).domain
-            relativeLink = reverse("reset-password", kwargs={"token": token})
-            absolute_url = "http://" + current_site_domain + relativeLink
-            message = ". Use this link to reset your password. \n"
-            email_body = "Hi " + user.first_name + message + absolute_url + "\n"
-            data = {
-                "email_subject": "Reset Password",
-                "email_body": email_body,
-                "to_email": [email],
-            }
+            data = emails.password_reset_email(
+                get_current_site(request).domain,
+                user,
+                links.password_reset.make_link_token(user),
+            )
 
-            utils.Mail.send_mail(data=data)
+            outbox.enqueue(data=data)
 
             return Response(
                 {"status": _("Reset email sent successfully")},
@@ -227,30 +608,14 @@ class PasswordResetAPIView(views.APIView):
 
     def get(self, request, token):
 
-        try:
-            user_token = Token.objects.get(key=token)
-
-            try:
-                get_user_model().objects.get(id=user_token.user.id)
-
-                return Response({"status": "valid"})
-
-            except get_user_model().DoesNotExist:
-
-                return Response(
-                    {
-                        "status": _(
-                            "Invalid token, user no longer exists in our system, please contact customer support"
-                        )
-                    }
-                )
-
-        except Token.DoesNotExist:
+        if links.password_reset.get_user(token) is None:
             return Response(
                 {"status": _("Invalid token, please try again")},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        return Response({"status": "valid"})
+
     def post(self, request, token):
 
         serializer = self.serializer_class(data=request.data)
@@ -260,19 +625,62 @@ class PasswordResetAPIView(views.APIView):
         new_password = serializer.data["confirm_password"]
         print(f"New password - {new_password}")
 
-        user_token = Token.objects.get(key=token)
+        user = links.password_reset.get_user(token)
 
-        user = get_user_model().objects.get(id=user_token.user.id)
+        if user is None:
+            return Response(
+                {"status": _("Invalid token, please try again")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        user.set_password(new_password)
+        hashing.set_password(user, new_password)
 
         user.save()
+        tokens.rotate(user)
+        jwt_tokens.revoke_user(user)
 
         return Response(
             {"status": _("Password successfully reset")}, status=status.HTTP_200_OK
         )
 
 
+def date_parts(value):
+    return {
+        "year": value.year,
+        "month": value.month,
+        "day": value.day,
+        "time": value.time().strftime("%H:%M:%S"),
+    }
+
+
+def token_payload(user, token):
+    """User details returned alongside an authentication token"""
+
+    return {
+        "token": str(token),
+        "user_id": user.pk,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "date_joined": date_parts(user.date_joined),
+        "date_updated": date_parts(user.date_updated),
+    }
+
+
+def jwt_payload(token):
+    """``token_payload`` read from the claims of a JSON Web Token"""
+
+    return {
+        "token": str(token),
+        "user_id": token[jwt_settings.USER_ID_CLAIM],
+        "email": token["email"],
+        "first_name": token["first_name"],
+        "last_name": token["last_name"],
+        "date_joined": date_parts(parse_datetime(token["date_joined"])),
+        "date_updated": date_parts(parse_datetime(token["date_updated"])),
+    }
+
+
 class VerifyTokenAPIView(views.APIView):
     """API view responsible for verifying token"""
 
@@ -285,35 +693,59 @@ class VerifyTokenAPIView(views.APIView):
         serializer.is_valid(raise_exception=True)
         token = serializer.validated_data["token"]
 
-        try:
-            user_token = Token.objects.get(key=token)
-        except Token.DoesNotExist:
+        # JSON Web Tokens are answered from their claims, without a query
+        if jwt_tokens.looks_like_jwt(token):
+            access = jwt_tokens.verify(token)
+
+            if access is None:
+                return Response({"status": "Invalid Token"})
+
+            return Response({"status": "Valid Token", **jwt_payload(access)})
+
+        resolved = authentication.resolve_token(token)
+
+        if resolved is None:
             return Response({"status": "Invalid Token"})
 
-        user = get_user_model().objects.get(id=user_token.user.id)
+        user, user_token = resolved
 
-        return Response(
-            {
-                "status": "Valid Token",
-                "token": Token.objects.get(user=user).key,
-                "user_id": user.pk,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "date_joined": {
-                    "year": user.date_joined.year,
-                    "month": user.date_joined.month,
-                    "day": user.date_joined.day,
-                    "time": user.date_joined.time().strftime("%H:%M:%S"),
-                },
-                "date_updated": {
-                    "year": user.date_joined.year,
-                    "month": user.date_joined.month,
-                    "day": user.date_joined.day,
-                    "time": user.date_joined.time().strftime("%H:%M:%S"),
-                },
-            }
+        return Response({"status": "Valid Token", **token_payload(user, user_token)})
+
+
+class BatchVerifyTokenAPIView(views.APIView):
+    """API view responsible for verifying many tokens at once"""
+
+    serializer_class = serializers.BatchTokenVerificationSerializer
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tokens = serializer.validated_data["tokens"]
+
+        resolved = authentication.resolve_tokens(
+            [token for token in tokens if not jwt_tokens.looks_like_jwt(token)]
         )
+        results = []
+
+        for token in tokens:
+            if jwt_tokens.looks_like_jwt(token):
+                access = jwt_tokens.verify(token)
+                results.append(
+                    {"status": "Valid Token", **jwt_payload(access)}
+                    if access is not None
+                    else {"status": "Invalid Token", "token": token}
+                )
+            elif token in resolved:
+                user, user_token = resolved[token]
+                results.append(
+                    {"status": "Valid Token", **token_payload(user, user_token)}
+                )
+            else:
+                results.append({"status": "Invalid Token", "token": token})
+
+        return Response({"results": results})
 
 
 class AuthTokenAPIView(ObtainAuthToken):
@@ -330,26 +762,78 @@ class AuthTokenAPIView(ObtainAuthToken):
         print(request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
-        token, created_at = Token.objects.get_or_create(user=user)
+        token, created_at = tokens.get_or_create(user)
 
-        return Response(
-            {
-                "token": str(token),
-                "user_id": user.pk,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "date_joined": {
-                    "year": user.date_joined.year,
-                    "month": user.date_joined.month,
-                    "day": user.date_joined.day,
-                    "time": user.date_joined.time().strftime("%H:%M:%S"),
-                },
-                "date_updated": {
-                    "year": user.date_joined.year,
-                    "month": user.date_joined.month,
-                    "day": user.date_joined.day,
-                    "time": user.date_joined.time().strftime("%H:%M:%S"),
-                },
-            }
+        return Response(token_payload(user, token))
+
+
+class JWTObtainAPIView(AuthTokenAPIView):
+    """API view responsible for obtaining a JSON Web Token pair"""
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(
+            data=request.data, context={"request": request}
         )
+        serializer.is_valid(raise_exception=True)
+        refresh = jwt_tokens.issue(serializer.validated_data["user"])
+
+        return Response({**jwt_payload(refresh.access_token), "refresh": str(refresh)})
+
+
+class JWTRefreshAPIView(views.APIView):
+    """API view responsible for refreshing a JSON Web Token pair"""
+
+    serializer_class = serializers.JWTRefreshSerializer
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            refresh = jwt_tokens.refresh(serializer.validated_data["refresh"])
+        except TokenError as error:
+            return Response({"status": str(error)}, status=status.HTTP_401_UNAUTHORIZED)
+
+        return Response({**jwt_payload(refresh.access_token), "refresh": str(refresh)})
+
+
+class JWTRevokeAPIView(views.APIView):
+    """API view responsible for revoking a JSON Web Token pair"""
+
+    serializer_class = serializers.JWTRevokeSerializer
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            pair = [RefreshToken(serializer.validated_data["refresh"])]
+
+            if "access" in serializer.validated_data:
+                pair.append(AccessToken(serializer.validated_data["access"]))
+        except TokenError as error:
+            return Response({"status": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        for token in pair:
+            jwt_tokens.revoke(token)
+
+        return Response({"status": _("Token revoked")}, status=status.HTTP_200_OK)
+
+
+def metrics_view(request):
+    """Serves the metrics registry in the Prometheus text format"""
+
+    # Not an API endpoint, only scrapers on the allowed addresses see it
+    if request.META.get("REMOTE_ADDR") not in getattr(
+        settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"]
+    ):
+        raise Http404()
+
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )